@@ -3,14 +3,21 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 import matplotlib.pyplot as plt
-import io
-import base64
-import ezdxf
 import tempfile
 import os
-import pyvista as pv
 from datetime import datetime
 
+from analysis import (calculate_grade_tonnage_curve, calculate_statistics, compute_attribute_mask,
+                      compute_spatial_mask, mesh_from_dxf, read_block_model, read_options)
+from export_utils import DOWNLOAD_MAX_BYTES, EXPORT_FORMATS, EXPORT_RETENTION_SECONDS, export_to_tempfile, publish_export
+from estimation import ESTIMATION_METHODS, estimate_grades
+from comparison import align_blocks, block_deltas, detect_block_size, domain_reconciliation
+from swath import AXES, calculate_swaths, default_bin_sizes
+from viewer3d import DEFAULT_POINT_BUDGET, DEFAULT_TRIANGLE_BUDGET, build_lod_figure, mesh_to_arrays, voxel_aggregate
+from profiling import categorical_filter_columns, extend_profile, profile_column, profile_model, profile_table
+from result_store import DEFAULT_MAX_BYTES, DEFAULT_STORE_PATH, ResultStore, hash_bytes, make_key
+from subblocks import DEFAULT_SUBDIVISIONS, block_dimensions, block_tonnage, spatial_volume_fraction
+
 # Configuration de la page
 st.set_page_config(
     page_title="Block Model Analyzer",
@@ -229,7 +236,7 @@ st.markdown("""
 <div class="feature-box">
     <div class="feature-title"><span>📐</span> Contraintes spatiales DXF</div>
     <p class="feature-description">
-        Appliquez des contraintes spatiales à votre analyse en important des fichiers DXF d'enveloppes minéralisées ou de surfaces (topographie, fonds de fosse). Seuls les blocs respectant ces contraintes seront inclus dans l'analyse.
+        Appliquez des contraintes spatiales à votre analyse en important des fichiers DXF d'enveloppes minéralisées ou de surfaces (topographie, fonds de fosse). Seuls les blocs respectant ces contraintes seront inclus dans l'analyse. Les modèles sous-blocs sont pris en charge : les blocs en bordure peuvent être comptés pour leur seule fraction de volume retenue.
     </p>
 </div>
 
@@ -240,6 +247,13 @@ st.markdown("""
     </p>
 </div>
 
+<div class="feature-box">
+    <div class="feature-title"><span>🎯</span> Estimation des teneurs</div>
+    <p class="feature-description">
+        Estimez une nouvelle colonne de teneur à partir d'un fichier de composites, par plus proche voisin ou inverse des distances, avec un ellipsoïde de recherche anisotrope et des nombres minimal et maximal de composites.
+    </p>
+</div>
+
 <div class="feature-box">
     <div class="feature-title"><span>📈</span> Statistiques descriptives</div>
     <p class="feature-description">
@@ -254,10 +268,31 @@ st.markdown("""
     </p>
 </div>
 
+<div class="feature-box">
+    <div class="feature-title"><span>📏</span> Swaths</div>
+    <p class="feature-description">
+        Validez le modèle par tranches X, Y et Z : teneur moyenne pondérée par le tonnage et tonnage par tranche, avec comparaison optionnelle de plusieurs colonnes (estimation, plus proche voisin, composites).
+    </p>
+</div>
+
+<div class="feature-box">
+    <div class="feature-title"><span>⚖️</span> Comparaison de modèles</div>
+    <p class="feature-description">
+        Importez un second modèle (trimestre précédent, modèle de contrôle des teneurs) pour apparier les blocs sur la grille, mesurer les écarts bloc à bloc, réconcilier tonnage, teneur et métal par domaine et comparer les courbes tonnage-teneur.
+    </p>
+</div>
+
+<div class="feature-box">
+    <div class="feature-title"><span>🧊</span> Vue 3D</div>
+    <p class="feature-description">
+        Visualisez en 3D les blocs filtrés colorés par teneur, avec l'enveloppe et la surface DXF superposées. Les blocs sont regroupés en voxels selon un budget d'affichage et se raffinent lorsque la zone visualisée est réduite.
+    </p>
+</div>
+
 <div class="feature-box">
     <div class="feature-title"><span>💾</span> Export des résultats</div>
     <p class="feature-description">
-        Exportez vos résultats d'analyse (statistiques, courbes tonnage-teneur) aux formats CSV ou Excel pour les intégrer dans des rapports ou les analyser avec d'autres outils.
+        Exportez vos résultats d'analyse (statistiques, courbes tonnage-teneur) ainsi que le modèle de blocs filtré aux formats CSV, Parquet ou Excel pour les intégrer dans des rapports ou les analyser avec d'autres outils.
     </p>
 </div>
 """, unsafe_allow_html=True)
@@ -265,26 +300,6 @@ st.markdown("""
 st.markdown('</div>', unsafe_allow_html=True)
 
 # Fonctions principales
-def is_point_in_mesh(point, mesh):
-    """Vérifie si un point est à l'intérieur d'un maillage fermé."""
-    try:
-        points = pv.PolyData([point])
-        selection = points.select_enclosed_points(mesh)
-        return bool(selection["SelectedPoints"][0])
-    except Exception as e:
-        st.error(f"Erreur lors de la vérification spatiale: {e}")
-        return False
-
-def is_point_above_surface(point, surface):
-    """Détermine si un point est au-dessus d'une surface."""
-    try:
-        x, y, z = point
-        closest_point, _ = surface.find_closest_point([x, y, z])
-        return z > closest_point[2]
-    except Exception as e:
-        st.error(f"Erreur lors de la vérification de position: {e}")
-        return False
-
 def load_dxf_as_mesh(dxf_file, is_surface=False):
     """Charge un fichier DXF et le convertit en maillage pyvista."""
     try:
@@ -292,121 +307,171 @@ def load_dxf_as_mesh(dxf_file, is_surface=False):
         temp_file.write(dxf_file.getvalue())
         temp_file.close()
         
-        doc = ezdxf.readfile(temp_file.name)
-        msp = doc.modelspace()
-        
-        vertices = []
-        faces = []
+        try:
+            mesh = mesh_from_dxf(temp_file.name)
+        finally:
+            os.unlink(temp_file.name)
         
-        if is_surface:
-            for entity in msp:
-                if entity.dxftype() == '3DFACE':
-                    verts = [entity.dxf.vtx0, entity.dxf.vtx1, entity.dxf.vtx2, entity.dxf.vtx3]
-                    current_face = []
-                    
-                    for v in verts:
-                        idx = None
-                        for i, existing_v in enumerate(vertices):
-                            if np.allclose(v, existing_v):
-                                idx = i
-                                break
-                        
-                        if idx is None:
-                            idx = len(vertices)
-                            vertices.append(v)
-                        
-                        current_face.append(idx)
-                    
-                    faces.append(current_face[:3])
-                    if not np.allclose(verts[2], verts[3]):
-                        faces.append([current_face[0], current_face[2], current_face[3]])
-        else:
-            for entity in msp:
-                if entity.dxftype() in ('3DFACE', 'POLYLINE', 'LWPOLYLINE'):
-                    if entity.dxftype() == '3DFACE':
-                        verts = [entity.dxf.vtx0, entity.dxf.vtx1, entity.dxf.vtx2, entity.dxf.vtx3]
-                        current_face = []
-                        for v in verts:
-                            idx = None
-                            for i, existing_v in enumerate(vertices):
-                                if np.allclose(v, existing_v):
-                                    idx = i
-                                    break
-                            
-                            if idx is None:
-                                idx = len(vertices)
-                                vertices.append(v)
-                            
-                            current_face.append(idx)
-                        
-                        faces.append(current_face[:3])
-                        if not np.allclose(verts[2], verts[3]):
-                            faces.append([current_face[0], current_face[2], current_face[3]])
-        
-        os.unlink(temp_file.name)
-        
-        if len(vertices) > 0 and len(faces) > 0:
-            mesh = pv.PolyData(np.array(vertices), np.array(faces))
-            return mesh
-        else:
+        if mesh is None:
             st.warning("Aucune géométrie valide trouvée dans le fichier DXF.")
-            return None
+        return mesh
     
     except Exception as e:
         st.error(f"Erreur lors du chargement du fichier DXF: {e}")
         return None
 
-def calculate_statistics(df, value_column):
-    """Calcule les statistiques descriptives pour une colonne de valeurs."""
-    if df.empty:
-        return pd.DataFrame()
-    
-    stats = {
-        "Nombre de blocs": len(df),
-        "Minimum": df[value_column].min(),
-        "Maximum": df[value_column].max(),
-        "Moyenne": df[value_column].mean(),
-        "Médiane": df[value_column].median(),
-        "Écart-type": df[value_column].std(),
-        "Coefficient de variation": df[value_column].std() / df[value_column].mean() if df[value_column].mean() != 0 else np.nan,
-        "Quartile 25%": df[value_column].quantile(0.25),
-        "Quartile 75%": df[value_column].quantile(0.75),
-    }
-    
-    if 'tonnage' in df.columns:
-        stats["Tonnage total"] = df['tonnage'].sum()
-    
-    return pd.DataFrame(list(stats.items()), columns=['Statistique', 'Valeur'])
+def column_bounds(profile, df, column):
+    """Bornes (min, max) d'une colonne, lues dans le profil du modèle ; (0, 1) si elle n'a aucune valeur numérique."""
+    column_profile = profile["columns"].get(column) or profile_column(df[column])
+    if column_profile["min"] is None or column_profile["max"] is None:
+        st.warning(f"La colonne '{column}' ne contient aucune valeur numérique : bornes de filtre par défaut (0, 1).")
+        return 0.0, 1.0
+    return float(column_profile["min"]), float(column_profile["max"])
 
-def calculate_grade_tonnage_curve(df, grade_column, tonnage_column, cutoffs):
-    """Calcule la courbe tonnage-teneur pour différentes teneurs de coupure."""
-    if df.empty or not cutoffs:
-        return pd.DataFrame()
-    
-    results = []
-    total_tonnage = df[tonnage_column].sum()
-    
-    for cutoff in cutoffs:
-        above_cutoff = df[df[grade_column] >= cutoff]
-        
-        if above_cutoff.empty:
-            tonnage_above = 0
-            avg_grade_above = 0
-            metal_content = 0
-        else:
-            tonnage_above = above_cutoff[tonnage_column].sum()
-            avg_grade_above = (above_cutoff[grade_column] * above_cutoff[tonnage_column]).sum() / tonnage_above if tonnage_above > 0 else 0
-            metal_content = tonnage_above * avg_grade_above / 100
-        
-        results.append({
-            "Teneur de coupure": cutoff,
-            "Tonnage > coupure": tonnage_above,
-            "% du tonnage total": 100 * tonnage_above / total_tonnage if total_tonnage > 0 else 0,
-            "Teneur moyenne > coupure": avg_grade_above,
-            "Contenu métallique": metal_content
-        })
-    
-    return pd.DataFrame(results)
+# Exports volumineux servis par la route statique de Streamlit (app/static/exports/...)
+STATIC_EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "exports")
+
+def render_download(label, sheets, file_stem, fmt, key):
+    """Écrit l'export sur disque par paquets puis le sert via un bouton de téléchargement.
+
+    Streamlit conserve en mémoire le contenu d'un bouton de téléchargement : au-delà
+    de BMA_DOWNLOAD_MAX_MB, le fichier est publié dans static/exports et téléchargé
+    par un lien, servi depuis le disque (server.enableStaticServing).
+    """
+    extension, mime = EXPORT_FORMATS[fmt]
+    try:
+        with st.spinner("Préparation de l'export..."):
+            path = export_to_tempfile(sheets, fmt)
+    except Exception as e:
+        st.error(f"Erreur lors de l'export: {e}")
+        return
+
+    size = os.path.getsize(path)
+    max_bytes = int(os.environ.get("BMA_DOWNLOAD_MAX_MB", DOWNLOAD_MAX_BYTES // (1024 * 1024))) * 1024 * 1024
+    if size > max_bytes:
+        if st.get_option("server.enableStaticServing"):
+            file_name = f"{file_stem}_{datetime.now():%Y%m%d_%H%M%S}{extension}"
+            relative_url = publish_export(path, STATIC_EXPORT_DIR, file_name)
+            st.markdown(f'<a href="app/static/exports/{relative_url}" download="{file_name}">'
+                        f'{label} ({size / (1024 * 1024):.0f} Mo)</a>', unsafe_allow_html=True)
+            st.caption(f"Lien valable {EXPORT_RETENTION_SECONDS // 3600} heures.")
+            return
+        st.warning(f"L'export ({size / (1024 * 1024):.0f} Mo) est servi depuis la mémoire du serveur : "
+                   "activez server.enableStaticServing pour le servir depuis le disque.")
+
+    try:
+        with open(path, 'rb') as fh:
+            st.download_button(label, data=fh, file_name=f"{file_stem}{extension}", mime=mime, key=key)
+    finally:
+        os.unlink(path)
+
+@st.cache_resource
+def get_result_store():
+    """Stockage de résultats partagé par toutes les sessions de l'application."""
+    path = os.environ.get("BMA_RESULT_STORE", DEFAULT_STORE_PATH)
+    max_bytes = int(os.environ.get("BMA_RESULT_STORE_MAX_MB", DEFAULT_MAX_BYTES // (1024 * 1024))) * 1024 * 1024
+    return ResultStore(path, max_bytes)
+
+def uploaded_file_hash(uploaded_file):
+    """Empreinte d'un fichier importé, mémorisée dans la session pour ne pas le relire à chaque interaction."""
+    hashes = st.session_state.setdefault("file_hashes", {})
+    file_key = (uploaded_file.name, uploaded_file.size, getattr(uploaded_file, 'file_id', None))
+    if file_key not in hashes:
+        hashes[file_key] = hash_bytes(uploaded_file.getbuffer())
+    return hashes[file_key]
+
+def cached_frame(store, key, compute):
+    """Retourne le tableau stocké sous `key`, ou le calcule puis le stocke."""
+    frame = store.get_frame(key)
+    if frame is None:
+        frame = compute()
+        if not frame.empty:
+            store.put_frame(key, frame)
+    return frame
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def cached_voxel_view(view_key, _points, _values, _weights, point_budget):
+    """Agrégation en voxels mémorisée par clé de vue (filtres, zone, budget)."""
+    return voxel_aggregate(_points, _values, _weights, point_budget)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def cached_mesh_arrays(mesh_hash, triangle_budget, _mesh):
+    """Maillage DXF décimé mémorisé par empreinte de fichier et budget de triangles."""
+    return mesh_to_arrays(_mesh, triangle_budget)
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def cached_block_size(model_key, column, _values):
+    """Taille de bloc détectée pour une colonne de coordonnées d'un modèle."""
+    return detect_block_size(_values)
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def cached_alignment(align_key, _df_a, _df_b, columns_a, columns_b, block_sizes):
+    """Appariement des blocs de deux modèles mémorisé par clé (modèles, colonnes, tailles de bloc).
+
+    Les coordonnées ne sont extraites qu'en cas d'absence du cache ; les indices
+    retournés sont partagés et ne doivent pas être modifiés en place.
+    """
+    return align_blocks(_df_a[columns_a].to_numpy(dtype=float), _df_b[columns_b].to_numpy(dtype=float), block_sizes)
+
+def matched_values(frame, columns, rows):
+    """Valeurs (n, k) des colonnes demandées pour les seules lignes appariées."""
+    return frame.iloc[rows, [frame.columns.get_loc(col) for col in columns]].to_numpy(dtype=float)
+
+def matched_block_deltas(df_a, df_b, columns_a, columns_b, idx_a, idx_b):
+    """Écarts bloc à bloc des lignes appariées ; colonnes : X, Y, Z, teneur, tonnage de chaque modèle."""
+    values_a = matched_values(df_a, columns_a, idx_a)
+    values_b = matched_values(df_b, columns_b, idx_b)
+    positions = np.arange(len(idx_a))
+    return block_deltas(values_a[:, :3], values_a[:, 3], values_b[:, 3], values_a[:, 4], values_b[:, 4],
+                        positions, positions)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def cached_estimation(estimation_key, _df, _composites, block_columns, sample_columns, sample_grade, method, power,
+                      ranges, angles, min_samples, max_samples):
+    """Estimation des teneurs mémorisée par clé (modèle, composites, colonnes, paramètres).
+
+    Les coordonnées et teneurs ne sont extraites du modèle et des composites qu'en cas d'absence du cache.
+    """
+    return estimate_grades(_df[block_columns].to_numpy(dtype=float),
+                           _composites[sample_columns].to_numpy(dtype=float),
+                           _composites[sample_grade].to_numpy(dtype=float),
+                           method, power, ranges, angles, min_samples, max_samples)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def cached_estimate_profile(estimation_key, _estimate):
+    """Profil de la colonne estimée, calculé une fois par estimation."""
+    return profile_column(pd.Series(_estimate))
+
+# Nombre de modèles gardés en mémoire pour toutes les sessions, par cache (principal, comparaison)
+MODEL_CACHE_ENTRIES = int(os.environ.get("BMA_MODEL_CACHE_ENTRIES", 4))
+
+def read_and_profile(uploaded_file, delimiter, decimal, sheet_name):
+    """Lit un modèle de blocs importé et profile ses colonnes."""
+    uploaded_file.seek(0)
+    df, _ = read_block_model(uploaded_file, delimiter, decimal, sheet_name)
+    return df, profile_model(df)
+
+@st.cache_resource(max_entries=MODEL_CACHE_ENTRIES, show_spinner=False)
+def load_block_model(model_key, _uploaded_file, delimiter, decimal, sheet_name):
+    """Modèle de blocs et profil de ses colonnes, calculés une fois par fichier et partagés entre sessions.
+
+    Le DataFrame retourné est partagé : il ne doit jamais être modifié en place.
+    """
+    return read_and_profile(_uploaded_file, delimiter, decimal, sheet_name)
+
+@st.cache_resource(max_entries=MODEL_CACHE_ENTRIES, show_spinner=False)
+def load_composites(composites_key, _uploaded_file, delimiter, decimal, sheet_name):
+    """Composites lus une fois par fichier et options de lecture, partagés entre sessions."""
+    _uploaded_file.seek(0)
+    composites, _ = read_block_model(_uploaded_file, delimiter, decimal, sheet_name)
+    return composites
+
+@st.cache_resource(max_entries=MODEL_CACHE_ENTRIES, show_spinner=False)
+def load_compare_model(model_key, _uploaded_file, delimiter, decimal, sheet_name):
+    """Modèle de comparaison, dans un cache distinct pour ne pas évincer les modèles principaux."""
+    return read_and_profile(_uploaded_file, delimiter, decimal, sheet_name)
+
+result_store = get_result_store()
 
 # Barre latérale
 with st.sidebar:
@@ -416,6 +481,7 @@ with st.sidebar:
                                        type=["csv", "xlsx", "xls"],
                                        help="Formats supportés: CSV, Excel")
     
+    delimiter, decimal, sheet_name = ",", ".", ""
     if block_model_file is not None:
         file_type = block_model_file.name.split('.')[-1].lower()
         if file_type == 'csv':
@@ -432,6 +498,29 @@ with st.sidebar:
     with col2:
         surface_file = st.file_uploader("Surface DXF", type=["dxf"])
     
+    st.markdown('<h3 class="sidebar-heading">⚖️ Modèle de comparaison (optionnel)</h3>', unsafe_allow_html=True)
+    compare_file = st.file_uploader("Second modèle de blocs", type=["csv", "xlsx", "xls"],
+                                    help="Même format et mêmes options de lecture que le modèle principal")
+    
+    st.markdown('<h3 class="sidebar-heading">🎯 Composites (optionnel)</h3>', unsafe_allow_html=True)
+    composites_file = st.file_uploader("Fichier de composites", type=["csv", "xlsx", "xls"],
+                                       help="Composites utilisés pour estimer une nouvelle colonne de teneur")
+    
+    composites_delimiter, composites_decimal, composites_sheet = ",", ".", ""
+    if composites_file is not None:
+        if composites_file.name.split('.')[-1].lower() == 'csv':
+            composites_delimiter = st.selectbox("Délimiteur (composites)", options=[",", ";", "\t"], index=0)
+            composites_decimal = st.selectbox("Séparateur décimal (composites)", options=[".", ","], index=0)
+        else:
+            composites_sheet = st.text_input("Feuille Excel des composites (vide = première feuille)", "")
+    
+    st.markdown('<h3 class="sidebar-heading">🗄️ Résultats partagés</h3>', unsafe_allow_html=True)
+    store_entries, store_bytes = result_store.usage()
+    st.caption(f"{store_entries} résultats en cache ({store_bytes / (1024 * 1024):.1f} Mo sur {result_store.max_bytes / (1024 * 1024):.0f} Mo)")
+    if st.button("Vider le cache de résultats"):
+        result_store.clear()
+        st.rerun()
+    
     st.markdown('<div style="margin-top:2rem;"><hr></div>', unsafe_allow_html=True)
     st.markdown("""
     <div style="padding: 0.8rem; background-color: #f8f9fa; border-radius: 8px; margin-top: 1rem;">
@@ -448,21 +537,18 @@ with st.sidebar:
 
 # Charger les données
 df = None
+model_key = None
 if block_model_file is not None:
     try:
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.markdown('<div class="card-title">📊 Chargement des données</div>', unsafe_allow_html=True)
         
         with st.spinner("Chargement en cours..."):
-            file_type = block_model_file.name.split('.')[-1].lower()
-            
-            if file_type in ['xls', 'xlsx']:
-                if sheet_name and sheet_name.strip():
-                    df = pd.read_excel(block_model_file, sheet_name=sheet_name)
-                else:
-                    df = pd.read_excel(block_model_file)
-            elif file_type == 'csv':
-                df = pd.read_csv(block_model_file, sep=delimiter, decimal=decimal)
+            model_key = make_key("model", file=uploaded_file_hash(block_model_file),
+                                 read=read_options(block_model_file, delimiter, decimal, sheet_name))
+            shared_df, profile = load_block_model(model_key, block_model_file, delimiter, decimal, sheet_name)
+            # Copie superficielle : les colonnes ajoutées pendant la session ne touchent pas le modèle partagé
+            df = shared_df.copy(deep=False)
             
             st.markdown("""
             <div class="success-box">
@@ -492,20 +578,49 @@ if block_model_file is not None:
     except Exception as e:
         st.error(f"Erreur lors du chargement du fichier: {e}")
 
+# Charger le modèle de comparaison si présent
+compare_df = None
+compare_profile = None
+compare_key = None
+if compare_file is not None:
+    try:
+        with st.spinner("Chargement du modèle de comparaison..."):
+            compare_key = make_key("model", file=uploaded_file_hash(compare_file),
+                                   read=read_options(compare_file, delimiter, decimal, sheet_name))
+            compare_df, compare_profile = load_compare_model(compare_key, compare_file, delimiter, decimal, sheet_name)
+    except Exception as e:
+        st.error(f"Erreur lors du chargement du modèle de comparaison: {e}")
+
+# Charger les composites si présents
+composites_df = None
+composites_key = None
+if composites_file is not None:
+    try:
+        with st.spinner("Chargement des composites..."):
+            composites_key = make_key("composites", file=uploaded_file_hash(composites_file),
+                                      read=read_options(composites_file, composites_delimiter, composites_decimal, composites_sheet))
+            composites_df = load_composites(composites_key, composites_file, composites_delimiter, composites_decimal, composites_sheet)
+    except Exception as e:
+        st.error(f"Erreur lors du chargement des composites: {e}")
+
 # Charger les fichiers DXF si présents
 envelope_mesh = None
+envelope_hash = None
 if envelopes_file is not None:
     with st.spinner("Chargement de l'enveloppe DXF..."):
         envelope_mesh = load_dxf_as_mesh(envelopes_file, is_surface=False)
+        envelope_hash = uploaded_file_hash(envelopes_file)
         if envelope_mesh:
             st.success("Enveloppe DXF chargée avec succès")
         else:
             st.warning("Impossible de charger l'enveloppe DXF comme maillage fermé")
 
 surface_mesh = None
+surface_hash = None
 if surface_file is not None:
     with st.spinner("Chargement de la surface DXF..."):
         surface_mesh = load_dxf_as_mesh(surface_file, is_surface=True)
+        surface_hash = uploaded_file_hash(surface_file)
         if surface_mesh:
             st.success("Surface DXF chargée avec succès")
         else:
@@ -520,27 +635,106 @@ if df is not None:
     st.subheader("Aperçu des données")
     st.dataframe(df.head(), use_container_width=True)
     
+    with st.expander("Profil des colonnes"):
+        st.dataframe(profile_table(profile), use_container_width=True)
+    
     col1, col2 = st.columns(2)
     
     with col1:
         # Sélection des colonnes pour l'analyse
         st.subheader("Sélection des colonnes")
         
-        # Détecter automatiquement les colonnes de coordonnées
-        x_col_guess = next((col for col in df.columns if col.lower() in ['x', 'east', 'easting', 'x_centre']), df.columns[0])
-        y_col_guess = next((col for col in df.columns if col.lower() in ['y', 'north', 'northing', 'y_centre']), df.columns[1] if len(df.columns) > 1 else df.columns[0])
-        z_col_guess = next((col for col in df.columns if col.lower() in ['z', 'elev', 'elevation', 'z_centre']), df.columns[2] if len(df.columns) > 2 else df.columns[0])
+        # Colonnes de coordonnées devinées lors du profilage du modèle
+        x_col_guess = profile["roles"]["x"]
+        y_col_guess = profile["roles"]["y"]
+        z_col_guess = profile["roles"]["z"]
         
         x_column = st.selectbox("Colonne coordonnée X", options=df.columns, index=df.columns.get_loc(x_col_guess) if x_col_guess in df.columns else 0)
         y_column = st.selectbox("Colonne coordonnée Y", options=df.columns, index=df.columns.get_loc(y_col_guess) if y_col_guess in df.columns else 0)
         z_column = st.selectbox("Colonne coordonnée Z", options=df.columns, index=df.columns.get_loc(z_col_guess) if z_col_guess in df.columns else 0)
         
-        # Deviner les colonnes de teneur et tonnage
-        grade_col_guess = next((col for col in df.columns if any(k in col.lower() for k in ['grade', 'teneur', 'au', 'cu', 'ag', 'zn', 'pb'])), df.columns[3] if len(df.columns) > 3 else df.columns[0])
-        tonnage_col_guess = next((col for col in df.columns if any(k in col.lower() for k in ['ton', 'mass', 'weight'])), None)
+        # Estimation d'une nouvelle colonne de teneur à partir des composites
+        if composites_df is not None:
+            with st.expander("🎯 Estimation à partir des composites", expanded=False):
+                def composite_column_index(column, keywords):
+                    guess = column if column in composites_df.columns else next(
+                        (col for col in composites_df.columns if col.lower() in keywords), composites_df.columns[0])
+                    return composites_df.columns.get_loc(guess)
+                
+                comp_x = st.selectbox("Composites X", options=composites_df.columns, index=composite_column_index(x_column, ['x', 'east', 'easting']))
+                comp_y = st.selectbox("Composites Y", options=composites_df.columns, index=composite_column_index(y_column, ['y', 'north', 'northing']))
+                comp_z = st.selectbox("Composites Z", options=composites_df.columns, index=composite_column_index(z_column, ['z', 'elev', 'elevation']))
+                comp_grade = st.selectbox("Teneur des composites", options=composites_df.columns,
+                                          index=composites_df.columns.get_loc(next((col for col in composites_df.columns if col not in (comp_x, comp_y, comp_z)), composites_df.columns[0])))
+                
+                estimation_method = st.radio("Méthode", ESTIMATION_METHODS, horizontal=True)
+                idw_power = st.number_input("Puissance", min_value=0.5, max_value=5.0, value=2.0, step=0.5) if estimation_method == "Inverse des distances" else 2.0
+                
+                st.markdown("**Ellipsoïde de recherche**")
+                range_major = st.number_input("Portée principale (m)", min_value=0.1, value=100.0, step=10.0)
+                range_semi = st.number_input("Portée secondaire (m)", min_value=0.1, value=100.0, step=10.0)
+                range_minor = st.number_input("Portée mineure (m)", min_value=0.1, value=50.0, step=10.0)
+                azimuth = st.number_input("Azimut (°)", min_value=0.0, max_value=360.0, value=0.0, step=5.0)
+                dip = st.number_input("Pendage (°)", min_value=-90.0, max_value=90.0, value=0.0, step=5.0)
+                plunge = st.number_input("Plongée (°)", min_value=-90.0, max_value=90.0, value=0.0, step=5.0)
+                
+                min_samples = st.number_input("Nombre minimal de composites", min_value=1, max_value=64, value=1, step=1)
+                max_samples = st.number_input("Nombre maximal de composites", min_value=1, max_value=64, value=16, step=1)
+                
+                suffix = "nn" if estimation_method == "Plus proche voisin" else "idw"
+                estimated_column = st.text_input("Nom de la colonne estimée", f"{comp_grade}_{suffix}")
+                
+                if st.checkbox("Ajouter la colonne estimée au modèle"):
+                    estimation_params = {
+                        "method": estimation_method,
+                        "power": idw_power,
+                        "ranges": (range_major, range_semi, range_minor),
+                        "angles": (azimuth, dip, plunge),
+                        "min_samples": int(min_samples),
+                        "max_samples": int(max(min_samples, max_samples)),
+                    }
+                    estimation_key = make_key("estimation", model=model_key, composites=composites_key,
+                                              columns=[x_column, y_column, z_column, comp_x, comp_y, comp_z, comp_grade],
+                                              params=estimation_params)
+                    
+                    with st.spinner("Estimation des teneurs en cours..."):
+                        estimate, n_used = cached_estimation(
+                            estimation_key, df, composites_df,
+                            [x_column, y_column, z_column], [comp_x, comp_y, comp_z], comp_grade,
+                            **estimation_params)
+                    
+                    df[estimated_column] = estimate
+                    profile = extend_profile(profile, {estimated_column: cached_estimate_profile(estimation_key, estimate)})
+                    # La colonne estimée fait partie du modèle analysé : les résultats en cache en dépendent
+                    model_key = make_key("model", base=model_key, estimation=estimation_key, column=estimated_column)
+                    
+                    estimated_count = int(np.count_nonzero(~np.isnan(estimate)))
+                    st.success(f"{estimated_count:,} blocs estimés sur {len(df):,} "
+                               f"({np.mean(n_used[n_used > 0]) if estimated_count else 0:.1f} composites en moyenne)")
+        
+        # Colonnes de teneur et tonnage devinées lors du profilage
+        grade_col_guess = profile["roles"]["grade"]
+        tonnage_col_guess = profile["roles"]["tonnage"]
         
+        tonnage_params = None
         grade_column = st.selectbox("Colonne teneur", options=df.columns, index=df.columns.get_loc(grade_col_guess) if grade_col_guess in df.columns else 0)
         
+        # Dimensions des blocs : colonnes par bloc (modèle sous-blocs) ou taille fixe
+        size_guesses = [profile["roles"][role] for role in ("dx", "dy", "dz")]
+        numeric_columns = [col for col, column_profile in profile["columns"].items() if column_profile["numeric"]]
+        use_size_columns = st.checkbox("Dimensions par bloc (modèle sous-blocs)",
+                                       value=all(col in numeric_columns for col in size_guesses),
+                                       help="Lit la taille de chaque bloc dans des colonnes (XINC, YINC, ZINC...)")
+        
+        if use_size_columns:
+            size_columns = [st.selectbox(f"Dimension {axis}", options=numeric_columns,
+                                         index=numeric_columns.index(guess) if guess in numeric_columns else 0)
+                            for axis, guess in zip("XYZ", size_guesses)]
+            block_size = None
+        else:
+            size_columns = None
+            block_size = [st.number_input(f"Taille {axis} (m)", min_value=0.1, value=5.0, step=0.5) for axis in "XYZ"]
+        
         if tonnage_col_guess in df.columns:
             tonnage_column = st.selectbox("Colonne tonnage", options=df.columns, index=df.columns.get_loc(tonnage_col_guess))
         else:
@@ -549,7 +743,7 @@ if df is not None:
             calculate_tonnage = st.checkbox("Calculer le tonnage")
             
             if calculate_tonnage:
-                density_col_guess = next((col for col in df.columns if any(k in col.lower() for k in ['dens', 'sg', 'specific'])), None)
+                density_col_guess = profile["roles"]["density"]
                 
                 if density_col_guess in df.columns:
                     density_column = st.selectbox("Colonne densité", options=df.columns, index=df.columns.get_loc(density_col_guess))
@@ -557,48 +751,40 @@ if df is not None:
                     density_column = st.selectbox("Colonne densité", options=df.columns, index=0)
                 
                 default_density = st.number_input("Densité par défaut", min_value=0.1, max_value=10.0, value=2.7, step=0.1)
-                block_size_x = st.number_input("Taille X (m)", min_value=0.1, value=5.0, step=0.5)
-                block_size_y = st.number_input("Taille Y (m)", min_value=0.1, value=5.0, step=0.5)
-                block_size_z = st.number_input("Taille Z (m)", min_value=0.1, value=5.0, step=0.5)
                 
-                # Calculer le tonnage si demandé
-                if calculate_tonnage and st.button("Calculer le tonnage"):
-                    if density_column in df.columns:
-                        df['densité'] = df[density_column].fillna(default_density)
-                    else:
-                        df['densité'] = default_density
-                    
-                    # Calcul du volume et du tonnage
-                    df['volume'] = block_size_x * block_size_y * block_size_z
-                    df['tonnage'] = df['volume'] * df['densité']
-                    tonnage_column = 'tonnage'
-                    st.success("Tonnage calculé avec succès!")
+                # Volume propre à chaque bloc x densité ; seule la copie de session reçoit la colonne
+                tonnage_params = {"density_column": density_column, "default_density": default_density,
+                                  "size_columns": size_columns, "block_size": block_size}
+                df['tonnage'] = block_tonnage(df, **tonnage_params)
+                tonnage_column = 'tonnage'
     
     with col2:
         # Filtres
         st.subheader("Filtres")
         
         # Filtres numériques pour les coordonnées
-        x_min, x_max = float(df[x_column].min()), float(df[x_column].max())
-        y_min, y_max = float(df[y_column].min()), float(df[y_column].max())
-        z_min, z_max = float(df[z_column].min()), float(df[z_column].max())
+        x_min, x_max = column_bounds(profile, df, x_column)
+        y_min, y_max = column_bounds(profile, df, y_column)
+        z_min, z_max = column_bounds(profile, df, z_column)
         
         filter_x = st.slider("Filtre X", min_value=x_min, max_value=x_max, value=(x_min, x_max))
         filter_y = st.slider("Filtre Y", min_value=y_min, max_value=y_max, value=(y_min, y_max))
         filter_z = st.slider("Filtre Z", min_value=z_min, max_value=z_max, value=(z_min, z_max))
         
         # Filtres pour les attributs catégoriels
-        categorical_columns = [col for col in df.columns if df[col].dtype == 'object' or df[col].nunique() < 20]
+        categorical_filter_column = "Aucun"
+        selected_categories = []
+        categorical_columns = categorical_filter_columns(profile)
         
         if categorical_columns:
             categorical_filter_column = st.selectbox("Filtre catégoriel", options=["Aucun"] + categorical_columns)
             
             if categorical_filter_column != "Aucun":
-                categories = sorted(df[categorical_filter_column].unique())
+                categories = profile["columns"][categorical_filter_column]["categories"]
                 selected_categories = st.multiselect("Valeurs à inclure", options=categories, default=categories)
         
         # Filtres sur la teneur
-        grade_min, grade_max = float(df[grade_column].min()), float(df[grade_column].max())
+        grade_min, grade_max = column_bounds(profile, df, grade_column)
         filter_grade = st.slider(f"Filtre teneur ({grade_column})", 
                               min_value=grade_min, 
                               max_value=grade_max, 
@@ -617,64 +803,92 @@ if df is not None:
         if surface_mesh:
             use_surface = st.checkbox("Filtrer par surface DXF")
             if use_surface:
-                surface_relation = st.radio("Relation à la surface", ["Au-dessus", "En-dessous"])
+                surface_relation = st.radio("Relation à la surface", ["Au-dessus", "En-dessous"],
+                                            help="Hors de l'emprise de la surface, chaque bloc est comparé "
+                                                 "à l'altitude du sommet de la surface le plus proche")
                 spatial_filters.append("surface_" + ("above" if surface_relation == "Au-dessus" else "below"))
+        
+        # Volume partiel : les blocs traversés par un maillage ne comptent que pour leur part retenue
+        partial_volume = False
+        if spatial_filters:
+            partial_volume = st.checkbox("Volume partiel des blocs en bordure",
+                                         help="Les cellules parentes traversées par un maillage sont sous-découpées ; "
+                                              "le tonnage des blocs est pondéré par leur fraction de volume retenue")
+            if partial_volume:
+                if size_columns is not None:
+                    default_parent = [profile["columns"][col]["max"] or 1.0 for col in size_columns]
+                else:
+                    default_parent = block_size
+                parent_size = [st.number_input(f"Cellule parente {axis} (m)", min_value=0.1, value=float(size), step=0.5)
+                               for axis, size in zip("XYZ", default_parent)]
+                subdivisions = st.slider("Subdivisions par axe", min_value=2, max_value=6, value=DEFAULT_SUBDIVISIONS)
     
     st.markdown('</div>', unsafe_allow_html=True)
     
     # Appliquer les filtres sélectionnés
-    filtered_df = df.copy()
-    
-    # Filtres de coordonnées
-    filtered_df = filtered_df[(filtered_df[x_column] >= filter_x[0]) & 
-                             (filtered_df[x_column] <= filter_x[1]) &
-                             (filtered_df[y_column] >= filter_y[0]) & 
-                             (filtered_df[y_column] <= filter_y[1]) &
-                             (filtered_df[z_column] >= filter_z[0]) & 
-                             (filtered_df[z_column] <= filter_z[1])]
-    
-    # Filtre de teneur
-    filtered_df = filtered_df[(filtered_df[grade_column] >= filter_grade[0]) & 
-                             (filtered_df[grade_column] <= filter_grade[1])]
-    
-    # Filtre catégoriel
-    if 'categorical_filter_column' in locals() and categorical_filter_column != "Aucun" and selected_categories:
-        filtered_df = filtered_df[filtered_df[categorical_filter_column].isin(selected_categories)]
-    
-    # Filtres spatiaux
-    if spatial_filters:
-        original_count = len(filtered_df)
-        
-        # Créer une colonne pour le résultat des filtres spatiaux
-        filtered_df['in_spatial_filter'] = True
-        
-        # Appliquer chaque filtre spatial
-        for filter_type in spatial_filters:
-            if filter_type == "envelope" and envelope_mesh:
-                # Pour chaque point, vérifier s'il est dans l'enveloppe
-                with st.spinner("Application du filtre d'enveloppe DXF..."):
-                    for idx, row in filtered_df.iterrows():
-                        point = [row[x_column], row[y_column], row[z_column]]
-                        filtered_df.at[idx, 'in_envelope'] = is_point_in_mesh(point, envelope_mesh)
-                    filtered_df = filtered_df[filtered_df['in_envelope']]
-            
-            elif filter_type.startswith("surface_") and surface_mesh:
-                relation = filter_type.split('_')[1]  # "above" ou "below"
-                
-                with st.spinner(f"Application du filtre de surface DXF ({relation})..."):
-                    for idx, row in filtered_df.iterrows():
-                        point = [row[x_column], row[y_column], row[z_column]]
-                        is_above = is_point_above_surface(point, surface_mesh)
-                        filtered_df.at[idx, 'above_surface'] = is_above
-                    
-                    if relation == "above":
-                        filtered_df = filtered_df[filtered_df['above_surface']]
-                    else:
-                        filtered_df = filtered_df[~filtered_df['above_surface']]
+    categorical_column = categorical_filter_column if categorical_filter_column != "Aucun" else None
+    filter_mask = compute_attribute_mask(df, x_column, y_column, z_column, filter_x, filter_y, filter_z,
+                                         grade_column, filter_grade, categorical_column, selected_categories)
+    
+    # Filtres spatiaux : le masque couvre tout le modèle et reste valable quels que soient les autres filtres
+    spatial_key = None
+    volume_fraction = None
+    if spatial_filters and partial_volume:
+        spatial_key = make_key("spatial_fraction", model=model_key, envelope=envelope_hash, surface=surface_hash,
+                               columns=[x_column, y_column, z_column], filters=spatial_filters,
+                               sizes=size_columns or block_size, parent=parent_size, subdivisions=subdivisions)
+        volume_fraction = result_store.get_array(spatial_key)
+        
+        if volume_fraction is None or len(volume_fraction) != len(df):
+            with st.spinner("Calcul des volumes partiels DXF..."):
+                points = df[[x_column, y_column, z_column]].to_numpy(dtype=float)
+                try:
+                    volume_fraction = spatial_volume_fraction(points, block_dimensions(df, size_columns, block_size),
+                                                              parent_size, spatial_filters, envelope_mesh, surface_mesh,
+                                                              subdivisions)
+                    result_store.put_array(spatial_key, volume_fraction)
+                except Exception as e:
+                    st.error(f"Erreur lors de la vérification spatiale: {e}")
+                    volume_fraction = np.zeros(len(df), dtype=np.float32)
+        
+        spatial_mask = volume_fraction > 0
+        blocks_filtered = int(np.count_nonzero(filter_mask & ~spatial_mask))
+        blocks_partial = int(np.count_nonzero(filter_mask & spatial_mask & (volume_fraction < 1)))
+        filter_mask &= spatial_mask
+        st.info(f"{blocks_filtered} blocs supprimés par les filtres spatiaux, {blocks_partial} blocs retenus en volume partiel")
+    elif spatial_filters:
+        spatial_key = make_key("spatial_mask", model=model_key, envelope=envelope_hash, surface=surface_hash,
+                               columns=[x_column, y_column, z_column], filters=spatial_filters)
+        spatial_mask = result_store.get_mask(spatial_key)
         
-        blocks_filtered = original_count - len(filtered_df)
+        if spatial_mask is None or len(spatial_mask) != len(df):
+            with st.spinner("Application des filtres spatiaux DXF..."):
+                points = df[[x_column, y_column, z_column]].to_numpy(dtype=float)
+                try:
+                    spatial_mask = compute_spatial_mask(points, spatial_filters, envelope_mesh, surface_mesh)
+                    result_store.put_mask(spatial_key, spatial_mask)
+                except Exception as e:
+                    st.error(f"Erreur lors de la vérification spatiale: {e}")
+                    spatial_mask = np.zeros(len(df), dtype=bool)
+        
+        blocks_filtered = int(np.count_nonzero(filter_mask & ~spatial_mask))
+        filter_mask &= spatial_mask
         st.info(f"{blocks_filtered} blocs supprimés par les filtres spatiaux")
     
+    filtered_df = df[filter_mask]
+    if volume_fraction is not None:
+        # Le tonnage des blocs en bordure est réduit à leur part retenue
+        fraction = volume_fraction[filter_mask]
+        filtered_df = filtered_df.assign(fraction_volume=fraction)
+        if tonnage_column in filtered_df.columns and pd.api.types.is_numeric_dtype(filtered_df[tonnage_column]):
+            filtered_df[tonnage_column] = filtered_df[tonnage_column].to_numpy(dtype=float) * fraction
+    
+    # Clé commune aux analyses calculées sur ce sous-ensemble
+    filter_key = make_key("filters", model=model_key, spatial=spatial_key, tonnage=tonnage_params,
+                          columns=[x_column, y_column, z_column, grade_column],
+                          ranges=[filter_x, filter_y, filter_z, filter_grade],
+                          categorical=[categorical_column, selected_categories if categorical_column else None])
+    
     # Afficher le nombre de blocs après filtrage
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown('<div class="card-title">📋 Résultats des filtres</div>', unsafe_allow_html=True)
@@ -706,13 +920,15 @@ if df is not None:
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown('<div class="card-title">📊 Analyses</div>', unsafe_allow_html=True)
     
-    tabs = st.tabs(["📈 Statistiques", "📉 Courbe Tonnage-Teneur"])
+    tabs = st.tabs(["📈 Statistiques", "📉 Courbe Tonnage-Teneur", "📏 Swaths", "⚖️ Comparaison", "🧊 Vue 3D", "💾 Export"])
     
     with tabs[0]:
         st.header("Statistiques descriptives")
         
         if not filtered_df.empty:
-            stats_df = calculate_statistics(filtered_df, grade_column)
+            stats_df = cached_frame(result_store, make_key("stats", filters=filter_key, grade=grade_column,
+                                                           tonnage=tonnage_column),
+                                    lambda: calculate_statistics(filtered_df, grade_column, tonnage_column))
             
             # Afficher les statistiques en format de carte moderne
             col1, col2 = st.columns(2)
@@ -723,11 +939,10 @@ if df is not None:
                 st.dataframe(stats_df, use_container_width=True)
                 
                 # Export des statistiques
-                if st.button("Exporter les statistiques (CSV)"):
-                    csv = stats_df.to_csv(index=False)
-                    b64 = base64.b64encode(csv.encode()).decode()
-                    href = f'<a href="data:file/csv;base64,{b64}" download="stats_{grade_column}.csv" class="download-button">Télécharger CSV</a>'
-                    st.markdown(href, unsafe_allow_html=True)
+                stats_format = st.radio("Format d'export", list(EXPORT_FORMATS), horizontal=True, key="stats_export_format")
+                if st.button("Exporter les statistiques"):
+                    render_download(f"Télécharger {stats_format}", {"Statistiques": stats_df},
+                                    f"stats_{grade_column}", stats_format, key="stats_download")
             
             with col2:
                 # Histogramme de la teneur
@@ -769,7 +984,9 @@ if df is not None:
             cutoffs = np.linspace(cutoff_range[0], cutoff_range[1], num_steps)
             
             # Calculer la courbe tonnage-teneur
-            gtc_df = calculate_grade_tonnage_curve(filtered_df, grade_column, tonnage_column, cutoffs)
+            gtc_key = make_key("gtc", filters=filter_key, grade=grade_column, tonnage=tonnage_column, cutoffs=cutoffs.tolist())
+            gtc_df = cached_frame(result_store, gtc_key,
+                                  lambda: calculate_grade_tonnage_curve(filtered_df, grade_column, tonnage_column, cutoffs))
             
             # Afficher le tableau
             st.subheader("Tableau Tonnage-Teneur")
@@ -835,28 +1052,322 @@ if df is not None:
             # Export des résultats
             st.subheader("Export des résultats")
             
+            gtc_format = st.radio("Format d'export", list(EXPORT_FORMATS), horizontal=True, key="gtc_export_format")
+            if st.button("Exporter la courbe tonnage-teneur"):
+                render_download(f"Télécharger {gtc_format}", {"Tonnage_Teneur": gtc_df},
+                                "tonnage_teneur", gtc_format, key="gtc_download")
+        else:
+            st.warning(f"Colonne de tonnage '{tonnage_column}' non trouvée ou aucune donnée disponible après filtrage.")
+
+    with tabs[2]:
+        st.header("Analyse en swaths")
+        
+        if not filtered_df.empty:
+            numeric_columns = [col for col in filtered_df.columns
+                               if pd.api.types.is_numeric_dtype(filtered_df[col]) and col not in (x_column, y_column, z_column)]
+            compare_columns = st.multiselect("Colonnes de comparaison (estimation, plus proche voisin...)",
+                                             options=[col for col in numeric_columns if col != grade_column])
+            swath_columns = [grade_column] + compare_columns
+            
+            coords = [filtered_df[col].to_numpy(dtype=float) for col in (x_column, y_column, z_column)]
+            default_sizes = default_bin_sizes(coords)
+            
+            # Valeur initiale posée une seule fois : la largeur saisie survit aux changements de filtres
+            col1, col2, col3 = st.columns(3)
+            bin_sizes = []
+            for col, axis, default_size in zip((col1, col2, col3), AXES, default_sizes):
+                width_key = f"swath_width_{axis}"
+                st.session_state.setdefault(width_key, float(round(max(default_size, 0.1), 1)))
+                with col:
+                    bin_sizes.append(st.number_input(f"Largeur des tranches {axis} (m)", min_value=0.1,
+                                                     step=1.0, key=width_key))
+            
+            weights = None
+            if tonnage_column in filtered_df.columns and pd.api.types.is_numeric_dtype(filtered_df[tonnage_column]):
+                weights = filtered_df[tonnage_column].to_numpy(dtype=float)
+            
+            swath_key = make_key("swath", filters=filter_key, columns=swath_columns, tonnage=tonnage_column, bins=bin_sizes)
+            swath_df = cached_frame(result_store, swath_key, lambda: calculate_swaths(
+                coords, {col: filtered_df[col].to_numpy(dtype=float) for col in swath_columns}, weights, bin_sizes))
+            
+            # Composites découpés selon les tranches du modèle filtré (même origine, mêmes largeurs)
+            plot_columns = list(swath_columns)
+            composite_label = None
+            if composites_df is not None and st.checkbox(
+                    f"Superposer les composites ({comp_grade})",
+                    help="Moyenne non pondérée des composites de chaque tranche du modèle ; les filtres ne s'appliquent pas aux composites."):
+                composite_label = f"{comp_grade} (composites)"
+                origins = [float(np.nanmin(axis_values)) for axis_values in coords]
+                composite_key = make_key("swath_composites", composites=composites_key,
+                                         columns=[comp_x, comp_y, comp_z, comp_grade], bins=bin_sizes, origins=origins)
+                composite_swath = cached_frame(result_store, composite_key, lambda: calculate_swaths(
+                    [composites_df[col].to_numpy(dtype=float) for col in (comp_x, comp_y, comp_z)],
+                    {composite_label: composites_df[comp_grade].to_numpy(dtype=float)}, None, bin_sizes, origins))
+                if not composite_swath.empty:
+                    swath_df = swath_df.merge(
+                        composite_swath[["Direction", "Centre", "Nombre de blocs", f"Moyenne {composite_label}"]]
+                        .rename(columns={"Nombre de blocs": "Nombre de composites"}),
+                        on=["Direction", "Centre"], how="left")
+                    plot_columns.append(composite_label)
+            
+            colors = ['#3498DB', '#E67E22', '#2ECC71', '#9B59B6', '#E74C3C']
+            for axis in AXES:
+                axis_df = swath_df[swath_df["Direction"] == axis]
+                
+                fig = go.Figure()
+                fig.add_trace(go.Bar(
+                    x=axis_df["Centre"],
+                    y=axis_df["Tonnage"] if weights is not None else axis_df["Nombre de blocs"],
+                    name="Tonnage" if weights is not None else "Nombre de blocs",
+                    marker_color='rgba(149, 165, 166, 0.4)',
+                    yaxis="y2"
+                ))
+                for i, col in enumerate(plot_columns):
+                    fig.add_trace(go.Scatter(
+                        x=axis_df["Centre"],
+                        y=axis_df[f"Moyenne {col}"],
+                        name=col,
+                        mode="lines+markers",
+                        line=dict(color=colors[i % len(colors)], width=3, dash="dash" if col == composite_label else "solid"),
+                        yaxis="y"
+                    ))
+                
+                fig.update_layout(
+                    title=f"Swath {axis}",
+                    xaxis=dict(title=f"Centre de tranche {axis}"),
+                    yaxis=dict(title="Teneur moyenne", side="left"),
+                    yaxis2=dict(title="Tonnage" if weights is not None else "Nombre de blocs", side="right", overlaying="y", showgrid=False),
+                    hovermode="x unified",
+                    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5)
+                )
+                st.plotly_chart(fig, use_container_width=True)
+            
+            with st.expander("Tableau des swaths"):
+                st.dataframe(swath_df, use_container_width=True)
+        else:
+            st.warning("Aucune donnée disponible après application des filtres.")
+    
+    with tabs[3]:
+        st.header("Comparaison de modèles")
+        
+        if compare_df is None:
+            st.info("Importez un second modèle de blocs dans la barre latérale pour comparer les deux modèles.")
+        elif tonnage_column not in df.columns or not pd.api.types.is_numeric_dtype(df[tonnage_column]):
+            st.warning(f"Colonne de tonnage '{tonnage_column}' non trouvée ou non numérique dans le modèle principal.")
+        elif st.toggle("Activer la comparaison", value=False):
+            def same_column_index(column):
+                return compare_df.columns.get_loc(column) if column in compare_df.columns else 0
+            
             col1, col2 = st.columns(2)
             
             with col1:
-                if st.button("Exporter en CSV"):
-                    csv = gtc_df.to_csv(index=False)
-                    b64 = base64.b64encode(csv.encode()).decode()
-                    href = f'<a href="data:file/csv;base64,{b64}" download="tonnage_teneur.csv" class="download-button">Télécharger CSV</a>'
-                    st.markdown(href, unsafe_allow_html=True)
+                st.subheader("Colonnes du modèle B")
+                compare_x = st.selectbox("Coordonnée X (B)", options=compare_df.columns, index=same_column_index(x_column))
+                compare_y = st.selectbox("Coordonnée Y (B)", options=compare_df.columns, index=same_column_index(y_column))
+                compare_z = st.selectbox("Coordonnée Z (B)", options=compare_df.columns, index=same_column_index(z_column))
+                compare_grade = st.selectbox("Teneur (B)", options=compare_df.columns, index=same_column_index(grade_column))
+                compare_tonnage = st.selectbox("Tonnage (B)", options=compare_df.columns, index=same_column_index(tonnage_column))
             
             with col2:
-                if st.button("Exporter en Excel"):
-                    # Excel export
-                    output = io.BytesIO()
-                    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                        gtc_df.to_excel(writer, sheet_name='Tonnage_Teneur', index=False)
-                    
-                    b64 = base64.b64encode(output.getvalue()).decode()
-                    href = f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}" download="tonnage_teneur.xlsx" class="download-button">Télécharger Excel</a>'
-                    st.markdown(href, unsafe_allow_html=True)
-        else:
-            st.warning(f"Colonne de tonnage '{tonnage_column}' non trouvée ou aucune donnée disponible après filtrage.")
+                st.subheader("Appariement des blocs")
+                block_sizes = []
+                for axis, column in zip(("X", "Y", "Z"), (x_column, y_column, z_column)):
+                    detected = cached_block_size(model_key, column, df[column].to_numpy(dtype=float))
+                    block_sizes.append(st.number_input(f"Taille de bloc {axis} (m)", min_value=0.001, value=float(detected),
+                                                       step=0.5, format="%.3f", key=f"compare_block_{axis}"))
+                
+                common_columns = [col for col in df.columns if col in compare_df.columns and col not in (x_column, y_column, z_column)]
+                domain_column = st.selectbox("Domaine de réconciliation", options=["Aucun"] + common_columns)
+            
+            # Les tableaux complets des deux modèles ne sont extraits qu'en cas d'absence du cache
+            columns_a = [x_column, y_column, z_column, grade_column, tonnage_column]
+            columns_b = [compare_x, compare_y, compare_z, compare_grade, compare_tonnage]
+            align_key = make_key("alignment", model=model_key, other=compare_key, sizes=block_sizes,
+                                 columns=[x_column, y_column, z_column, compare_x, compare_y, compare_z])
+            with st.spinner("Appariement des blocs..."):
+                idx_a, idx_b, (shared_a, shared_b) = cached_alignment(align_key, df, compare_df, columns_a[:3],
+                                                                      columns_b[:3], block_sizes)
+            if shared_a or shared_b:
+                st.warning(f"{shared_a:,} blocs de A et {shared_b:,} blocs de B partagent une cellule de grille avec "
+                           "d'autres blocs du même modèle (sous-blocs, doublons) : ils ne sont pas appariés. "
+                           "Vérifiez les tailles de bloc.")
+            
+            st.markdown(f"""
+            <div class="metric-container">
+                <div class="metric-card">
+                    <div class="metric-label">Blocs appariés</div>
+                    <div class="metric-value">{len(idx_a):,}</div>
+                </div>
+                <div class="metric-card">
+                    <div class="metric-label">Uniquement dans A</div>
+                    <div class="metric-value">{len(df) - len(idx_a) - shared_a:,}</div>
+                </div>
+                <div class="metric-card">
+                    <div class="metric-label">Uniquement dans B</div>
+                    <div class="metric-value">{len(compare_df) - len(idx_b) - shared_b:,}</div>
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            # Réconciliation par domaine, sur l'ensemble de chaque modèle
+            st.subheader("Réconciliation par domaine")
+            reconciliation_key = make_key("reconciliation", model=model_key, other=compare_key, domain=domain_column,
+                                          tonnage=tonnage_params,
+                                          columns=[grade_column, tonnage_column, compare_grade, compare_tonnage])
+            reconciliation_df = cached_frame(result_store, reconciliation_key, lambda: domain_reconciliation(
+                df[domain_column].to_numpy() if domain_column != "Aucun" else None,
+                df[grade_column].to_numpy(dtype=float), df[tonnage_column].to_numpy(dtype=float),
+                compare_df[domain_column].to_numpy() if domain_column != "Aucun" else None,
+                compare_df[compare_grade].to_numpy(dtype=float), compare_df[compare_tonnage].to_numpy(dtype=float)))
+            st.dataframe(reconciliation_df, use_container_width=True)
+            
+            # Écarts bloc à bloc
+            st.subheader("Écarts bloc à bloc (B - A)")
+            if len(idx_a) > 0:
+                def delta_summary():
+                    values_a = matched_values(df, [grade_column, tonnage_column], idx_a)
+                    values_b = matched_values(compare_df, [compare_grade, compare_tonnage], idx_b)
+                    grade_delta = values_b[:, 0] - values_a[:, 0]
+                    tonnage_delta = values_b[:, 1] - values_a[:, 1]
+                    return pd.DataFrame({
+                        "Statistique": ["Moyenne", "Écart-type", "Minimum", "Maximum", "Somme"],
+                        "Écart teneur": [np.nanmean(grade_delta), np.nanstd(grade_delta), np.nanmin(grade_delta), np.nanmax(grade_delta), np.nan],
+                        "Écart tonnage": [np.nanmean(tonnage_delta), np.nanstd(tonnage_delta), np.nanmin(tonnage_delta), np.nanmax(tonnage_delta), np.nansum(tonnage_delta)],
+                    })
+                
+                delta_key = make_key("delta_summary", alignment=align_key, tonnage=tonnage_params,
+                                     columns=[grade_column, tonnage_column, compare_grade, compare_tonnage])
+                st.dataframe(cached_frame(result_store, delta_key, delta_summary), use_container_width=True)
+                
+                with st.expander("Aperçu des écarts (1 000 premiers blocs appariés)"):
+                    st.dataframe(matched_block_deltas(df, compare_df, columns_a, columns_b, idx_a[:1000], idx_b[:1000]),
+                                 use_container_width=True)
+                
+                delta_format = st.radio("Format d'export", list(EXPORT_FORMATS), horizontal=True, key="delta_export_format")
+                if st.button("Exporter les écarts bloc à bloc"):
+                    deltas_df = matched_block_deltas(df, compare_df, columns_a, columns_b, idx_a, idx_b)
+                    render_download(f"Télécharger {delta_format}", {"Ecarts": deltas_df},
+                                    "ecarts_blocs", delta_format, key="delta_download")
+            else:
+                st.warning("Aucun bloc apparié : vérifiez les colonnes de coordonnées et les tailles de bloc.")
+            
+            # Courbes tonnage-teneur des deux modèles sur les mêmes teneurs de coupure
+            st.subheader("Courbes Tonnage-Teneur comparées")
+            grade_min_a, grade_max_a = column_bounds(profile, df, grade_column)
+            grade_min_b, grade_max_b = column_bounds(compare_profile, compare_df, compare_grade)
+            compare_cutoffs = np.linspace(min(grade_min_a, grade_min_b), max(grade_max_a, grade_max_b), 20)
+            gtc_a = cached_frame(result_store, make_key("gtc", model=model_key, grade=grade_column, tonnage=tonnage_column,
+                                                        tonnage_params=tonnage_params, cutoffs=compare_cutoffs.tolist()),
+                                 lambda: calculate_grade_tonnage_curve(df[[grade_column, tonnage_column]], grade_column,
+                                                                       tonnage_column, compare_cutoffs))
+            gtc_b = cached_frame(result_store, make_key("gtc", model=compare_key, grade=compare_grade, tonnage=compare_tonnage,
+                                                        cutoffs=compare_cutoffs.tolist()),
+                                 lambda: calculate_grade_tonnage_curve(compare_df[[compare_grade, compare_tonnage]],
+                                                                       compare_grade, compare_tonnage, compare_cutoffs))
+            
+            fig = go.Figure()
+            for label, gtc, color in (("A", gtc_a, '#3498DB'), ("B", gtc_b, '#E67E22')):
+                fig.add_trace(go.Scatter(x=gtc["Teneur de coupure"], y=gtc["Tonnage > coupure"],
+                                         name=f"Tonnage {label}", line=dict(color=color, width=3), yaxis="y"))
+                fig.add_trace(go.Scatter(x=gtc["Teneur de coupure"], y=gtc["Teneur moyenne > coupure"],
+                                         name=f"Teneur moyenne {label}", line=dict(color=color, width=2, dash="dash"), yaxis="y2"))
+            fig.update_layout(
+                title="Courbes Tonnage-Teneur A / B",
+                xaxis=dict(title="Teneur de coupure"),
+                yaxis=dict(title="Tonnage", side="left"),
+                yaxis2=dict(title="Teneur moyenne", side="right", overlaying="y"),
+                hovermode="x unified",
+                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5)
+            )
+            st.plotly_chart(fig, use_container_width=True)
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                st.dataframe(gtc_a, use_container_width=True)
+            with col2:
+                st.dataframe(gtc_b, use_container_width=True)
     
+    with tabs[4]:
+        st.header("Vue 3D des blocs filtrés")
+        
+        if not filtered_df.empty and st.toggle("Afficher la vue 3D", value=False):
+            st.markdown("""
+            <div class="info-box">
+                Les blocs sont fusionnés en voxels pour respecter le budget de points : réduisez la zone d'affichage pour raffiner la vue.
+                Les maillages DXF sont décimés au budget de triangles.
+            </div>
+            """, unsafe_allow_html=True)
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                point_budget = st.select_slider("Budget de points", options=[10_000, 25_000, 50_000, 100_000, 200_000], value=DEFAULT_POINT_BUDGET)
+                marker_size = st.slider("Taille des marqueurs", min_value=1, max_value=10, value=4)
+            with col2:
+                triangle_budget = st.select_slider("Budget de triangles par maillage", options=[5_000, 20_000, 50_000, 100_000], value=DEFAULT_TRIANGLE_BUDGET)
+                show_envelope = st.checkbox("Afficher l'enveloppe DXF", value=True) if envelope_mesh else False
+                show_surface = st.checkbox("Afficher la surface DXF", value=True) if surface_mesh else False
+            
+            # Zone d'affichage : plus elle est petite, plus les voxels sont fins
+            view_x = st.slider("Zone X", min_value=filter_x[0], max_value=filter_x[1], value=filter_x, key="view_x")
+            view_y = st.slider("Zone Y", min_value=filter_y[0], max_value=filter_y[1], value=filter_y, key="view_y")
+            view_z = st.slider("Zone Z", min_value=filter_z[0], max_value=filter_z[1], value=filter_z, key="view_z")
+            
+            x = filtered_df[x_column].to_numpy(dtype=float)
+            y = filtered_df[y_column].to_numpy(dtype=float)
+            z = filtered_df[z_column].to_numpy(dtype=float)
+            in_view = ((x >= view_x[0]) & (x <= view_x[1]) &
+                       (y >= view_y[0]) & (y <= view_y[1]) &
+                       (z >= view_z[0]) & (z <= view_z[1]))
+            
+            weights = None
+            if tonnage_column in filtered_df.columns and pd.api.types.is_numeric_dtype(filtered_df[tonnage_column]):
+                weights = filtered_df[tonnage_column].to_numpy(dtype=float)[in_view]
+            
+            view_key = make_key("view3d", filters=filter_key, columns=[x_column, y_column, z_column, grade_column, tonnage_column],
+                                zone=[view_x, view_y, view_z])
+            with st.spinner("Agrégation des blocs en voxels..."):
+                voxels = cached_voxel_view(view_key, np.column_stack([x, y, z])[in_view],
+                                           filtered_df[grade_column].to_numpy(dtype=float)[in_view], weights, point_budget)
+            
+            overlays = []
+            if show_envelope:
+                overlays.append(("Enveloppe", cached_mesh_arrays(envelope_hash, triangle_budget, envelope_mesh), "#E67E22"))
+            if show_surface:
+                overlays.append(("Surface", cached_mesh_arrays(surface_hash, triangle_budget, surface_mesh), "#95A5A6"))
+            
+            if voxels["cell_size"]:
+                st.caption(f"{int(in_view.sum()):,} blocs fusionnés en {len(voxels['centers']):,} voxels de {voxels['cell_size']:.1f} m")
+            else:
+                st.caption(f"{len(voxels['centers']):,} blocs affichés sans agrégation")
+            
+            fig = build_lod_figure(voxels, grade_column, overlays, bounds=(view_x, view_y, view_z), marker_size=marker_size)
+            st.plotly_chart(fig, use_container_width=True)
+        elif filtered_df.empty:
+            st.warning("Aucune donnée disponible après application des filtres.")
+    
+    with tabs[5]:
+        st.header("Export du modèle filtré")
+
+        if not filtered_df.empty:
+            st.markdown(f"""
+            <div class="info-box">
+                {len(filtered_df):,} blocs seront exportés par paquets, directement sur disque.
+                Le format Excel est limité à 1 048 576 lignes par feuille : les blocs suivants sont répartis sur des feuilles supplémentaires.
+            </div>
+            """, unsafe_allow_html=True)
+
+            export_columns = st.multiselect("Colonnes à exporter", options=list(filtered_df.columns), default=list(filtered_df.columns))
+            model_format = st.radio("Format d'export", list(EXPORT_FORMATS), horizontal=True, key="model_export_format")
+
+            if export_columns and st.button("Exporter le modèle filtré"):
+                # Sans volume partiel, l'export relit le modèle par paquets à travers le masque :
+                # l'écriture ne crée pas de copie supplémentaire au-delà d'un paquet
+                export_source = (filtered_df, None, export_columns) if volume_fraction is not None else (df, filter_mask, export_columns)
+                render_download(f"Télécharger {model_format}", {"Modele_filtre": export_source},
+                                "modele_filtre", model_format, key="model_download")
+        else:
+            st.warning("Aucune donnée disponible après application des filtres.")
+
     st.markdown('</div>', unsafe_allow_html=True)
 
 # Footer avec copyright
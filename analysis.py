@@ -0,0 +1,185 @@
+"""Fonctions d'analyse du modèle de blocs, partagées par l'application et le mode batch."""
+import ezdxf
+import numpy as np
+import pandas as pd
+import pyvista as pv
+from scipy.interpolate import LinearNDInterpolator
+from scipy.spatial import cKDTree
+
+SPATIAL_CHUNK_POINTS = 500_000
+
+
+def points_in_mesh(points, mesh):
+    """Vérifie, pour un tableau de points (n, 3), s'ils sont à l'intérieur d'un maillage fermé."""
+    inside = np.zeros(len(points), dtype=bool)
+    for start in range(0, len(points), SPATIAL_CHUNK_POINTS):
+        chunk = pv.PolyData(np.asarray(points[start:start + SPATIAL_CHUNK_POINTS], dtype=float))
+        selection = chunk.select_enclosed_points(mesh)
+        inside[start:start + len(chunk.points)] = selection["SelectedPoints"].astype(bool)
+    return inside
+
+
+def surface_elevation(points, surface):
+    """Altitude de la surface de référence de chaque point.
+
+    Dans l'emprise de la surface, l'altitude est interpolée à la verticale du point ;
+    hors emprise, c'est celle du sommet de la surface le plus proche du point.
+    """
+    points = np.asarray(points, dtype=float)
+    vertices = np.asarray(surface.points)
+    interpolator = LinearNDInterpolator(vertices[:, :2], vertices[:, 2])
+    elevation = interpolator(points[:, :2])
+
+    outside = np.flatnonzero(np.isnan(elevation) & np.isfinite(points).all(axis=1))
+    if len(outside):
+        _, nearest = cKDTree(vertices).query(points[outside])
+        elevation[outside] = vertices[nearest, 2]
+    return elevation
+
+
+def points_relative_to_surface(points, surface, relation):
+    """Retourne le masque des points au-dessus ("above") ou en dessous ("below") d'une surface."""
+    surface_z = surface_elevation(points, surface)
+    z = np.asarray(points)[:, 2]
+    with np.errstate(invalid='ignore'):
+        if relation == "above":
+            return z > surface_z
+        return z <= surface_z
+
+
+def compute_attribute_mask(df, x_column, y_column, z_column, filter_x, filter_y, filter_z,
+                           grade_column, filter_grade, categorical_column=None, selected_categories=None):
+    """Calcule le masque des blocs respectant les filtres de coordonnées, de teneur et catégoriel."""
+    x = df[x_column].to_numpy()
+    y = df[y_column].to_numpy()
+    z = df[z_column].to_numpy()
+    grade = df[grade_column].to_numpy()
+
+    mask = ((x >= filter_x[0]) & (x <= filter_x[1]) &
+            (y >= filter_y[0]) & (y <= filter_y[1]) &
+            (z >= filter_z[0]) & (z <= filter_z[1]) &
+            (grade >= filter_grade[0]) & (grade <= filter_grade[1]))
+
+    if categorical_column is not None and selected_categories:
+        mask &= df[categorical_column].isin(selected_categories).to_numpy()
+
+    return mask
+
+
+def compute_spatial_mask(points, spatial_filters, envelope_mesh=None, surface_mesh=None):
+    """Calcule le masque des points respectant l'ensemble des contraintes spatiales DXF."""
+    mask = np.ones(len(points), dtype=bool)
+    for filter_type in spatial_filters:
+        candidates = np.flatnonzero(mask)
+        if filter_type == "envelope" and envelope_mesh is not None:
+            mask[candidates] = points_in_mesh(points[candidates], envelope_mesh)
+        elif filter_type.startswith("surface_") and surface_mesh is not None:
+            relation = filter_type.split('_')[1]  # "above" ou "below"
+            mask[candidates] = points_relative_to_surface(points[candidates], surface_mesh, relation)
+    return mask
+
+
+def mesh_from_dxf(path):
+    """Lit les faces 3DFACE d'un fichier DXF et les convertit en maillage pyvista (None si aucune face)."""
+    doc = ezdxf.readfile(path)
+    msp = doc.modelspace()
+
+    # Les enveloppes et les surfaces sont lues à partir des faces 3DFACE
+    quads = [[entity.dxf.vtx0, entity.dxf.vtx1, entity.dxf.vtx2, entity.dxf.vtx3]
+             for entity in msp if entity.dxftype() == '3DFACE']
+    if not quads:
+        return None
+
+    quads = np.array(quads, dtype=float)
+
+    # Fusion des sommets communs aux faces adjacentes
+    vertices, inverse = np.unique(np.round(quads.reshape(-1, 3), 6), axis=0, return_inverse=True)
+    corner_idx = inverse.reshape(-1, 4)
+
+    # Chaque 3DFACE donne un triangle, ou deux si le quatrième sommet est distinct
+    is_quad = ~np.all(np.isclose(quads[:, 2], quads[:, 3]), axis=1)
+    faces = np.vstack([corner_idx[:, [0, 1, 2]], corner_idx[is_quad][:, [0, 2, 3]]])
+    faces = np.hstack([np.full((len(faces), 1), 3), faces]).ravel()
+    return pv.PolyData(vertices, faces)
+
+
+def calculate_statistics(df, value_column, tonnage_column='tonnage'):
+    """Calcule les statistiques descriptives pour une colonne de valeurs (et le tonnage total si `tonnage_column` existe)."""
+    if df.empty:
+        return pd.DataFrame()
+
+    stats = {
+        "Nombre de blocs": len(df),
+        "Minimum": df[value_column].min(),
+        "Maximum": df[value_column].max(),
+        "Moyenne": df[value_column].mean(),
+        "Médiane": df[value_column].median(),
+        "Écart-type": df[value_column].std(),
+        "Coefficient de variation": df[value_column].std() / df[value_column].mean() if df[value_column].mean() != 0 else np.nan,
+        "Quartile 25%": df[value_column].quantile(0.25),
+        "Quartile 75%": df[value_column].quantile(0.75),
+    }
+
+    if tonnage_column is not None and tonnage_column in df.columns:
+        stats["Tonnage total"] = df[tonnage_column].sum()
+
+    return pd.DataFrame(list(stats.items()), columns=['Statistique', 'Valeur'])
+
+
+def calculate_grade_tonnage_curve(df, grade_column, tonnage_column, cutoffs):
+    """Calcule la courbe tonnage-teneur pour différentes teneurs de coupure."""
+    if df.empty or len(cutoffs) == 0:
+        return pd.DataFrame()
+
+    grade = df[grade_column].to_numpy(dtype=float)
+    tonnage = np.nan_to_num(df[tonnage_column].to_numpy(dtype=float))
+    total_tonnage = tonnage.sum()
+
+    # Tri unique par teneur puis cumuls depuis les plus fortes teneurs :
+    # chaque teneur de coupure se résout par une recherche dichotomique
+    valid = ~np.isnan(grade)
+    order = np.argsort(grade[valid], kind='stable')
+    sorted_grade = grade[valid][order]
+    sorted_tonnage = tonnage[valid][order]
+    tonnage_from_top = np.append(np.cumsum(sorted_tonnage[::-1])[::-1], 0.0)
+    metal_from_top = np.append(np.cumsum((sorted_grade * sorted_tonnage)[::-1])[::-1], 0.0)
+
+    results = []
+    for cutoff in cutoffs:
+        start = np.searchsorted(sorted_grade, cutoff, side='left')
+        tonnage_above = tonnage_from_top[start]
+        avg_grade_above = metal_from_top[start] / tonnage_above if tonnage_above > 0 else 0
+        metal_content = tonnage_above * avg_grade_above / 100
+
+        results.append({
+            "Teneur de coupure": cutoff,
+            "Tonnage > coupure": tonnage_above,
+            "% du tonnage total": 100 * tonnage_above / total_tonnage if total_tonnage > 0 else 0,
+            "Teneur moyenne > coupure": avg_grade_above,
+            "Contenu métallique": metal_content
+        })
+
+    return pd.DataFrame(results)
+
+
+def read_options(source, delimiter=",", decimal=".", sheet_name=""):
+    """Options de lecture effectivement utilisées pour un fichier CSV ou Excel."""
+    file_name = getattr(source, 'name', str(source))
+    if file_name.split('.')[-1].lower() in ['xls', 'xlsx']:
+        return {"sheet": sheet_name}
+    return {"delimiter": delimiter, "decimal": decimal}
+
+
+def read_block_model(source, delimiter=",", decimal=".", sheet_name=""):
+    """Lit un modèle de blocs CSV ou Excel (fichier importé ou chemin) et retourne le DataFrame et les options de lecture."""
+    options = read_options(source, delimiter, decimal, sheet_name)
+
+    if "sheet" in options:
+        if sheet_name and sheet_name.strip():
+            df = pd.read_excel(source, sheet_name=sheet_name)
+        else:
+            df = pd.read_excel(source)
+        return df, options
+
+    df = pd.read_csv(source, sep=delimiter, decimal=decimal)
+    return df, options
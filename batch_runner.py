@@ -0,0 +1,284 @@
+"""Mode batch : évalue une matrice de scénarios sans interface et produit un rapport consolidé.
+
+Usage :
+    python batch_runner.py scenarios.yaml -o rapport.xlsx --workers 4
+
+Exemple de fichier de scénarios (YAML ou JSON, chemins relatifs au fichier) :
+
+    model:
+      path: modele.csv
+      delimiter: ";"
+      decimal: ","
+      columns: {x: XC, y: YC, z: ZC, grade: AU, tonnage: TONNAGE}
+    meshes:
+      fosse: fosse.dxf
+      topo: topo.dxf
+    cutoffs: {min: 0.2, max: 3.0, steps: 15}
+    scenarios:
+      - name: Domaine 1 dans la fosse
+        filters:
+          z: [100, 450]
+          categorical: {column: DOMAINE, values: [1]}
+        envelope: fosse
+        surface: {mesh: topo, relation: below}
+      - name: Toutes teneurs
+        cutoffs: [0.5, 1.0, 1.5]
+
+Le modèle et les maillages sont chargés une seule fois ; les masques spatiaux
+distincts puis les scénarios sont évalués sur un pool de processus qui partage
+les tableaux du processus parent (fork, copie à l'écriture).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from analysis import (calculate_grade_tonnage_curve, calculate_statistics, compute_attribute_mask,
+                      compute_spatial_mask, mesh_from_dxf, read_block_model)
+from export_utils import EXPORT_FORMATS, write_export
+from result_store import pack_mask, unpack_mask
+
+DEFAULT_CUTOFF_STEPS = 20
+OUTPUT_FORMATS = {extension: fmt for fmt, (extension, _) in EXPORT_FORMATS.items()}
+
+# Données partagées avec les processus du pool (héritées par fork)
+_SHARED = {}
+
+
+def load_scenario_file(path):
+    """Lit un fichier de scénarios YAML ou JSON."""
+    with open(path, encoding="utf-8") as fh:
+        if path.lower().endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError as e:
+                raise RuntimeError("La lecture des scénarios YAML nécessite le paquet 'pyyaml'.") from e
+            return yaml.safe_load(fh)
+        return json.load(fh)
+
+
+def _resolve_path(base_dir, path):
+    return path if os.path.isabs(path) else os.path.join(base_dir, path)
+
+
+def load_shared_data(config, base_dir):
+    """Charge une seule fois le modèle de blocs et les maillages DXF référencés."""
+    model_config = config["model"]
+    df, _ = read_block_model(_resolve_path(base_dir, model_config["path"]),
+                             model_config.get("delimiter", ","),
+                             model_config.get("decimal", "."),
+                             model_config.get("sheet", ""))
+
+    columns = {"x": "X", "y": "Y", "z": "Z", "grade": None, "tonnage": None}
+    columns.update(model_config.get("columns", {}))
+    missing = [role for role in ("x", "y", "z", "grade") if columns[role] not in df.columns]
+    if missing:
+        raise ValueError(f"Colonnes introuvables dans le modèle pour: {', '.join(missing)}")
+    if columns["tonnage"] is not None and columns["tonnage"] not in df.columns:
+        raise ValueError(f"Colonne de tonnage '{columns['tonnage']}' introuvable dans le modèle.")
+
+    meshes = {}
+    for name, path in config.get("meshes", {}).items():
+        mesh = mesh_from_dxf(_resolve_path(base_dir, path))
+        if mesh is None:
+            raise ValueError(f"Aucune géométrie valide trouvée dans le fichier DXF '{path}'.")
+        meshes[name] = mesh
+
+    return df, columns, meshes
+
+
+def spatial_spec(scenario):
+    """Contrainte spatiale d'un scénario : (enveloppe, surface, relation), chaque élément pouvant être None."""
+    surface = scenario.get("surface")
+    if isinstance(surface, str):
+        surface = {"mesh": surface}
+    if surface is None:
+        return scenario.get("envelope"), None, None
+    relation = surface.get("relation", "below")
+    if relation not in ("above", "below"):
+        raise ValueError(f"Relation à la surface inconnue: {relation}")
+    return scenario.get("envelope"), surface["mesh"], relation
+
+
+def resolve_cutoffs(spec, grade_values):
+    """Teneurs de coupure d'un scénario : liste explicite, plage {min, max, steps} ou plage des teneurs filtrées."""
+    if isinstance(spec, dict):
+        return np.linspace(spec["min"], spec["max"], int(spec.get("steps", DEFAULT_CUTOFF_STEPS)))
+    if spec is not None:
+        return np.asarray(spec, dtype=float)
+    if len(grade_values) == 0 or np.all(np.isnan(grade_values)):
+        return np.array([])
+    return np.linspace(np.nanmin(grade_values), np.nanmax(grade_values), DEFAULT_CUTOFF_STEPS)
+
+
+def _compute_spatial(spec):
+    """Tâche du pool : masque spatial sur tout le modèle pour une contrainte donnée."""
+    df, columns, meshes = _SHARED["df"], _SHARED["columns"], _SHARED["meshes"]
+    envelope, surface, relation = spec
+
+    spatial_filters = []
+    if envelope is not None:
+        spatial_filters.append("envelope")
+    if surface is not None:
+        spatial_filters.append(f"surface_{relation}")
+
+    points = df[[columns["x"], columns["y"], columns["z"]]].to_numpy(dtype=float)
+    mask = compute_spatial_mask(points, spatial_filters,
+                                meshes.get(envelope) if envelope else None,
+                                meshes.get(surface) if surface else None)
+    return spec, pack_mask(mask)
+
+
+def _evaluate_scenario(index):
+    """Tâche du pool : statistiques et courbe tonnage-teneur d'un scénario."""
+    df, columns = _SHARED["df"], _SHARED["columns"]
+    scenario = _SHARED["scenarios"][index]
+    name = scenario.get("name", f"Scénario {index + 1}")
+    grade_column = scenario.get("grade", columns["grade"])
+    tonnage_column = scenario.get("tonnage", columns["tonnage"])
+
+    filters = scenario.get("filters") or {}
+    unbounded = (-np.inf, np.inf)
+    categorical = filters.get("categorical") or {}
+    mask = compute_attribute_mask(df, columns["x"], columns["y"], columns["z"],
+                                  filters.get("x", unbounded), filters.get("y", unbounded), filters.get("z", unbounded),
+                                  grade_column, filters.get("grade", unbounded),
+                                  categorical.get("column"), categorical.get("values"))
+
+    spec = spatial_spec(scenario)
+    if spec != (None, None, None):
+        mask &= _SHARED["spatial_masks"][spec]
+
+    filtered_df = df[mask]
+    stats_df = calculate_statistics(filtered_df, grade_column, tonnage_column or 'tonnage')
+
+    gtc_df = pd.DataFrame()
+    if tonnage_column is not None:
+        cutoffs = resolve_cutoffs(scenario.get("cutoffs", _SHARED["default_cutoffs"]),
+                                  filtered_df[grade_column].to_numpy(dtype=float))
+        gtc_df = calculate_grade_tonnage_curve(filtered_df, grade_column, tonnage_column, cutoffs)
+
+    return name, stats_df, gtc_df
+
+
+def _init_worker(shared):
+    _SHARED.update(shared)
+
+
+def _pool(workers):
+    """Pool de processus ; fork permet aux processus de partager les tableaux déjà chargés."""
+    if "fork" in multiprocessing.get_all_start_methods():
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(dict(_SHARED),))
+
+
+def run_scenarios(config, base_dir, workers=None):
+    """Évalue tous les scénarios et retourne (rapport consolidé, statistiques, courbes tonnage-teneur)."""
+    df, columns, meshes = load_shared_data(config, base_dir)
+    scenarios = config.get("scenarios") or [{}]
+
+    # Colonnes utiles uniquement, pour limiter la mémoire partagée
+    used_columns = {columns["x"], columns["y"], columns["z"], columns["grade"]}
+    for scenario in scenarios:
+        used_columns.add(scenario.get("grade", columns["grade"]))
+        tonnage_column = scenario.get("tonnage", columns["tonnage"])
+        if tonnage_column is not None:
+            used_columns.add(tonnage_column)
+        categorical = (scenario.get("filters") or {}).get("categorical") or {}
+        if categorical.get("column"):
+            used_columns.add(categorical["column"])
+    if 'tonnage' in df.columns:
+        used_columns.add('tonnage')
+    df = df[[col for col in df.columns if col in used_columns]]
+
+    _SHARED.update(df=df, columns=columns, meshes=meshes, scenarios=scenarios,
+                   default_cutoffs=config.get("cutoffs"), spatial_masks={})
+
+    specs = sorted({spatial_spec(scenario) for scenario in scenarios} - {(None, None, None)}, key=str)
+    for envelope, surface, _ in specs:
+        for mesh_name in (envelope, surface):
+            if mesh_name is not None and mesh_name not in meshes:
+                raise ValueError(f"Maillage '{mesh_name}' non déclaré dans la section 'meshes'.")
+
+    # Les masques spatiaux distincts sont calculés avant les scénarios qui les partagent
+    if specs:
+        with _pool(workers) as pool:
+            for spec, packed in pool.map(_compute_spatial, specs):
+                _SHARED["spatial_masks"][spec] = unpack_mask(packed)
+
+    with _pool(workers) as pool:
+        results = list(pool.map(_evaluate_scenario, range(len(scenarios))))
+
+    return consolidate_results(results)
+
+
+def consolidate_results(results):
+    """Assemble les résultats des scénarios en tableaux longs et en un rapport consolidé."""
+    stats_frames, gtc_frames, summary_rows = [], [], []
+    for name, stats_df, gtc_df in results:
+        if not stats_df.empty:
+            stats_frames.append(stats_df.assign(**{"Scénario": name}))
+            summary_rows.append({"Scénario": name, **dict(zip(stats_df["Statistique"], stats_df["Valeur"]))})
+        else:
+            summary_rows.append({"Scénario": name, "Nombre de blocs": 0})
+        if not gtc_df.empty:
+            gtc_frames.append(gtc_df.assign(**{"Scénario": name}))
+
+    summary_df = pd.DataFrame(summary_rows)
+    stats_long = pd.concat(stats_frames, ignore_index=True) if stats_frames else pd.DataFrame()
+    gtc_long = pd.concat(gtc_frames, ignore_index=True) if gtc_frames else pd.DataFrame()
+
+    if not gtc_long.empty:
+        report_df = summary_df.merge(gtc_long, on="Scénario", how="left")
+    else:
+        report_df = summary_df
+
+    def scenario_first(frame):
+        return frame[["Scénario"] + [col for col in frame.columns if col != "Scénario"]] if not frame.empty else frame
+
+    return scenario_first(report_df), scenario_first(stats_long), scenario_first(gtc_long)
+
+
+def write_report(path, report_df, stats_df, gtc_df):
+    """Écrit le rapport : un classeur multi-feuilles en Excel, le tableau consolidé en CSV ou Parquet."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in OUTPUT_FORMATS:
+        raise ValueError(f"Extension de rapport non supportée: {extension} ({', '.join(OUTPUT_FORMATS)})")
+    fmt = OUTPUT_FORMATS[extension]
+
+    if fmt == "Excel":
+        sheets = {"Rapport": report_df}
+        if not stats_df.empty:
+            sheets["Statistiques"] = stats_df
+        if not gtc_df.empty:
+            sheets["Tonnage_Teneur"] = gtc_df
+        write_export(path, fmt, sheets)
+    else:
+        write_export(path, fmt, {"Rapport": report_df})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Évalue une matrice de scénarios sur un modèle de blocs.")
+    parser.add_argument("scenarios", help="Fichier de scénarios (YAML ou JSON)")
+    parser.add_argument("-o", "--output", default="rapport_scenarios.xlsx",
+                        help="Rapport consolidé (.csv, .parquet ou .xlsx)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Nombre de processus (par défaut : nombre de cœurs)")
+    args = parser.parse_args(argv)
+
+    config = load_scenario_file(args.scenarios)
+    base_dir = os.path.dirname(os.path.abspath(args.scenarios))
+
+    report_df, stats_df, gtc_df = run_scenarios(config, base_dir, args.workers)
+    write_report(args.output, report_df, stats_df, gtc_df)
+    print(f"{report_df['Scénario'].nunique()} scénarios évalués, rapport écrit dans {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
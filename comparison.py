@@ -0,0 +1,188 @@
+"""Comparaison et réconciliation de deux modèles de blocs par jointure sur indices de grille."""
+import numpy as np
+import pandas as pd
+
+# Taille maximale de la table d'appariement, en cellules de grille par bloc à apparier
+DENSE_GRID_FACTOR = 4
+
+
+def detect_block_size(values):
+    """Estime la taille de bloc d'une direction : plus petit écart entre coordonnées distinctes."""
+    unique_values = np.unique(np.round(np.asarray(values, dtype=float), 6))
+    unique_values = unique_values[np.isfinite(unique_values)]
+    if len(unique_values) < 2:
+        return 1.0
+    return float(np.diff(unique_values).min())
+
+
+def grid_indices(coords, origin, block_sizes):
+    """Convertit des coordonnées (n, 3) en indices entiers de grille (i, j, k)."""
+    return np.rint((np.asarray(coords, dtype=float) - origin) / np.asarray(block_sizes, dtype=float)).astype(np.int64)
+
+
+def align_blocks(coords_a, coords_b, block_sizes):
+    """Apparie les blocs de deux modèles par clé de grille entière.
+
+    Les coordonnées sont quantifiées sur une grille commune puis linéarisées en
+    clés int64, sans comparaison de flottants. Les clés portées par plusieurs
+    blocs d'un même modèle (sous-blocs d'une même cellule) ne sont pas appariées.
+    Retourne les positions appariées dans A et dans B et le nombre de blocs à
+    clé partagée de chaque modèle.
+    """
+    empty = np.array([], dtype=np.int64)
+    # Coordonnées rangées par axe (3, n) : les réductions par axe parcourent une mémoire contiguë
+    coords_a = np.ascontiguousarray(np.asarray(coords_a, dtype=float).T)
+    coords_b = np.ascontiguousarray(np.asarray(coords_b, dtype=float).T)
+    # Les blocs sans coordonnées complètes ne sont pas appariables
+    rows_a = np.flatnonzero(np.isfinite(coords_a).all(axis=0))
+    rows_b = np.flatnonzero(np.isfinite(coords_b).all(axis=0))
+    if len(rows_a) == 0 or len(rows_b) == 0:
+        return empty, empty, (0, 0)
+    if len(rows_a) < coords_a.shape[1]:
+        coords_a = coords_a[:, rows_a]
+    if len(rows_b) < coords_b.shape[1]:
+        coords_b = coords_b[:, rows_b]
+    origin = np.minimum(coords_a.min(axis=1), coords_b.min(axis=1))
+
+    ijk_a = grid_indices(coords_a.T, origin, block_sizes).T
+    ijk_b = grid_indices(coords_b.T, origin, block_sizes).T
+    del coords_a, coords_b
+    dims = np.maximum(ijk_a.max(axis=1), ijk_b.max(axis=1)) + 1
+
+    keys_a = (ijk_a[0] * dims[1] + ijk_a[1]) * dims[2] + ijk_a[2]
+    keys_b = (ijk_b[0] * dims[1] + ijk_b[1]) * dims[2] + ijk_b[2]
+    del ijk_a, ijk_b
+
+    n_cells = float(np.prod(dims.astype(float)))
+    if n_cells <= DENSE_GRID_FACTOR * (len(keys_a) + len(keys_b)):
+        matched_a, matched_b, shared = _match_dense(keys_a, keys_b, int(n_cells))
+    else:
+        matched_a, matched_b, shared = _match_sorted(keys_a, keys_b)
+    return rows_a[matched_a], rows_b[matched_b], shared
+
+
+def _match_dense(keys_a, keys_b, n_cells):
+    """Appariement par table indexée sur toutes les cellules de la grille (grille compacte)."""
+    count_a = np.bincount(keys_a, minlength=n_cells)
+    count_b = np.bincount(keys_b, minlength=n_cells)
+    row_of_cell = np.empty(n_cells, dtype=np.int64)
+    row_of_cell[keys_a] = np.arange(len(keys_a))
+
+    matched_b = np.flatnonzero((count_b[keys_b] == 1) & (count_a[keys_b] == 1))
+    matched_a = row_of_cell[keys_b[matched_b]]
+    shared = (int(np.count_nonzero(count_a[keys_a] > 1)), int(np.count_nonzero(count_b[keys_b] > 1)))
+    return matched_a, matched_b, shared
+
+
+def _match_sorted(keys_a, keys_b):
+    """Appariement par tri des clés (grille étendue et peu remplie)."""
+    order_a = np.argsort(keys_a)
+    sorted_a = keys_a[order_a]
+    order_b = np.argsort(keys_b)
+    sorted_b = keys_b[order_b]
+    shared_a = _shared_keys(sorted_a)
+    shared_b = _shared_keys(sorted_b)
+
+    candidates_a, candidate_rows_a = sorted_a[~shared_a], order_a[~shared_a]
+    candidates_b, candidate_rows_b = sorted_b[~shared_b], order_b[~shared_b]
+    if len(candidates_a) == 0:
+        return candidate_rows_a, candidate_rows_a, (int(np.count_nonzero(shared_a)), int(np.count_nonzero(shared_b)))
+    positions = np.minimum(np.searchsorted(candidates_a, candidates_b), len(candidates_a) - 1)
+    matched = candidates_a[positions] == candidates_b
+
+    shared = (int(np.count_nonzero(shared_a)), int(np.count_nonzero(shared_b)))
+    return candidate_rows_a[positions[matched]], candidate_rows_b[matched], shared
+
+
+def _shared_keys(sorted_keys):
+    """Marque, dans des clés triées, celles portées par plusieurs blocs."""
+    shared = np.zeros(len(sorted_keys), dtype=bool)
+    repeated = sorted_keys[1:] == sorted_keys[:-1]
+    shared[1:] |= repeated
+    shared[:-1] |= repeated
+    return shared
+
+
+def block_deltas(coords_a, grade_a, grade_b, tonnage_a, tonnage_b, idx_a, idx_b):
+    """Tableau des écarts bloc à bloc (B - A) pour les blocs appariés."""
+    coords = np.asarray(coords_a, dtype=float)[idx_a]
+    ga = np.asarray(grade_a, dtype=float)[idx_a]
+    gb = np.asarray(grade_b, dtype=float)[idx_b]
+    ta = np.asarray(tonnage_a, dtype=float)[idx_a]
+    tb = np.asarray(tonnage_b, dtype=float)[idx_b]
+    return pd.DataFrame({
+        "X": coords[:, 0],
+        "Y": coords[:, 1],
+        "Z": coords[:, 2],
+        "Teneur A": ga,
+        "Teneur B": gb,
+        "Écart teneur": gb - ga,
+        "Tonnage A": ta,
+        "Tonnage B": tb,
+        "Écart tonnage": tb - ta,
+        "Écart métal": (tb * gb - ta * ga) / 100,
+    })
+
+
+def _domain_codes(domains_a, domains_b, n_a, n_b):
+    """Codes de domaine communs aux deux modèles, obtenus par une factorisation conjointe des valeurs brutes.
+
+    Sans colonne de domaine (None), tous les blocs appartiennent au domaine « Total ».
+    """
+    if domains_a is None or domains_b is None:
+        return np.zeros(n_a, dtype=np.intp), np.zeros(n_b, dtype=np.intp), pd.Index(["Total"])
+
+    values_a, values_b = np.asarray(domains_a), np.asarray(domains_b)
+    # Valeurs de natures différentes (codes numériques d'un côté, texte de l'autre) : comparaison par libellé
+    if values_a.dtype.kind != values_b.dtype.kind:
+        values_a, values_b = values_a.astype(str), values_b.astype(str)
+    values = np.concatenate([values_a, values_b])
+    try:
+        codes, labels = pd.factorize(values, sort=True, use_na_sentinel=False)
+    except TypeError:
+        codes, labels = pd.factorize(values, sort=False, use_na_sentinel=False)
+    return codes[:len(values_a)], codes[len(values_a):], pd.Index(labels).astype(str)
+
+
+def _domain_totals(codes, n_domains, grade, tonnage):
+    """Tonnage, teneur moyenne pondérée et métal par code de domaine, suivis de leur total."""
+    grade = np.asarray(grade, dtype=float)
+    tonnage = np.nan_to_num(np.asarray(tonnage, dtype=float))
+    valid = np.isfinite(grade)
+
+    ton = np.bincount(codes, weights=tonnage, minlength=n_domains)
+    graded_ton = np.bincount(codes, weights=np.where(valid, tonnage, 0.0), minlength=n_domains)
+    metal = np.bincount(codes, weights=np.where(valid, tonnage * grade, 0.0), minlength=n_domains) / 100
+    ton, graded_ton, metal = (np.append(values, values.sum()) for values in (ton, graded_ton, metal))
+
+    # Teneur pondérée par le seul tonnage des blocs à teneur connue
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_grade = np.where(graded_ton > 0, metal * 100 / graded_ton, np.nan)
+    return ton, mean_grade, metal
+
+
+def domain_reconciliation(domains_a, grade_a, tonnage_a, domains_b, grade_b, tonnage_b):
+    """Compare tonnage, teneur et métal des deux modèles par domaine, avec une ligne de total.
+
+    Sans colonne de domaine (`domains_a` ou `domains_b` à None), seule la ligne de total est produite.
+    """
+    codes_a, codes_b, labels = _domain_codes(domains_a, domains_b, len(grade_a), len(grade_b))
+    ton_a, grade_mean_a, metal_a = _domain_totals(codes_a, len(labels), grade_a, tonnage_a)
+    ton_b, grade_mean_b, metal_b = _domain_totals(codes_b, len(labels), grade_b, tonnage_b)
+    merged = pd.DataFrame({
+        "Tonnage A": ton_a, "Teneur A": grade_mean_a, "Métal A": metal_a,
+        "Tonnage B": ton_b, "Teneur B": grade_mean_b, "Métal B": metal_b,
+    }, index=pd.Index(list(labels) + ["Total"], name="Domaine"))
+    if domains_a is None or domains_b is None:
+        merged = merged.iloc[-1:]
+
+    merged["Écart tonnage"] = merged["Tonnage B"] - merged["Tonnage A"]
+    merged["Écart teneur"] = merged["Teneur B"] - merged["Teneur A"]
+    merged["Écart métal"] = merged["Métal B"] - merged["Métal A"]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        merged["Écart métal (%)"] = np.where(merged["Métal A"] > 0,
+                                             100 * merged["Écart métal"] / merged["Métal A"], np.nan)
+
+    columns = ["Tonnage A", "Tonnage B", "Écart tonnage", "Teneur A", "Teneur B", "Écart teneur",
+               "Métal A", "Métal B", "Écart métal", "Écart métal (%)"]
+    return merged[columns].reset_index()
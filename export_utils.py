@@ -0,0 +1,182 @@
+"""Export en flux des résultats et du modèle de blocs filtré (CSV, Parquet, Excel)."""
+import os
+import secrets
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+# Extension et type MIME par format d'export
+EXPORT_FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "Parquet": (".parquet", "application/octet-stream"),
+    "Excel": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+DEFAULT_CHUNK_ROWS = 100_000
+EXCEL_MAX_ROWS = 1_048_576
+
+# Au-delà, l'export est servi depuis le disque et non par un bouton (Streamlit garde son contenu en mémoire)
+DOWNLOAD_MAX_BYTES = 200 * 1024 * 1024
+EXPORT_RETENTION_SECONDS = 6 * 3600
+
+
+def iter_row_chunks(df, mask=None, columns=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Itère sur les lignes retenues par paquets, sans copier l'ensemble filtré."""
+    columns = list(df.columns) if columns is None else list(columns)
+    col_positions = [df.columns.get_loc(col) for col in columns]
+
+    positions = np.flatnonzero(np.asarray(mask, dtype=bool)) if mask is not None else None
+    n_rows = len(positions) if positions is not None else len(df)
+
+    if n_rows == 0:
+        yield df.iloc[0:0, col_positions]
+        return
+
+    for start in range(0, n_rows, chunk_rows):
+        if positions is not None:
+            rows = positions[start:start + chunk_rows]
+        else:
+            rows = slice(start, start + chunk_rows)
+        yield df.iloc[rows, col_positions]
+
+
+def _normalize_sheets(sheets):
+    """Convertit {nom: DataFrame | (DataFrame, masque[, colonnes])} en liste (nom, df, masque, colonnes)."""
+    normalized = []
+    for name, source in sheets.items():
+        if isinstance(source, tuple):
+            frame, mask, columns = (tuple(source) + (None,))[:3]
+        else:
+            frame, mask, columns = source, None, None
+        normalized.append((name, frame, mask, columns))
+    return normalized
+
+
+def write_csv(path, df, mask=None, columns=None, chunk_rows=DEFAULT_CHUNK_ROWS, sep=",", decimal="."):
+    """Écrit un CSV par paquets de lignes."""
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        for i, chunk in enumerate(iter_row_chunks(df, mask, columns, chunk_rows)):
+            chunk.to_csv(fh, header=(i == 0), index=False, sep=sep, decimal=decimal)
+
+
+def parquet_schema(df, columns=None):
+    """Schéma Arrow de l'ensemble du tableau, établi avant l'écriture du premier paquet.
+
+    Les colonnes objet prennent le type de leur première valeur non nulle
+    (chaîne si la colonne est entièrement vide), pour qu'un paquet sans valeur
+    n'impose pas un type nul aux paquets suivants.
+    """
+    import pyarrow as pa
+
+    columns = list(df.columns) if columns is None else list(columns)
+    schema = pa.Schema.from_pandas(df.iloc[:0][columns], preserve_index=False)
+    for col in columns:
+        index = schema.get_field_index(str(col))
+        if not pa.types.is_null(schema.field(index).type):
+            continue
+        not_null = df[col].notna().to_numpy()
+        field_type = pa.array([df[col].iat[int(np.argmax(not_null))]]).type if not_null.any() else pa.string()
+        schema = schema.set(index, schema.field(index).with_type(field_type))
+    return schema
+
+
+def write_parquet(path, df, mask=None, columns=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Écrit un fichier Parquet par groupes de lignes (un groupe par paquet)."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("L'export Parquet nécessite le paquet 'pyarrow'.") from e
+
+    schema = parquet_schema(df, columns)
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in iter_row_chunks(df, mask, columns, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def write_excel(path, sheets, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Écrit un classeur Excel avec openpyxl en mode écriture seule.
+
+    Les feuilles dépassant la limite d'Excel sont prolongées dans des feuilles
+    suffixées (_2, _3, ...).
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    for name, frame, mask, columns in _normalize_sheets(sheets):
+        header = [str(col) for col in (frame.columns if columns is None else columns)]
+        part = 1
+        ws = wb.create_sheet(title=str(name)[:31])
+        ws.append(header)
+        rows_in_sheet = 1
+
+        for chunk in iter_row_chunks(frame, mask, columns, chunk_rows):
+            # Excel ne connaît pas NaN : les valeurs manquantes deviennent des cellules vides
+            chunk = chunk.astype(object).where(chunk.notna(), None)
+            for row in chunk.itertuples(index=False, name=None):
+                if rows_in_sheet >= EXCEL_MAX_ROWS:
+                    part += 1
+                    suffix = f"_{part}"
+                    ws = wb.create_sheet(title=str(name)[:31 - len(suffix)] + suffix)
+                    ws.append(header)
+                    rows_in_sheet = 1
+                ws.append(row)
+                rows_in_sheet += 1
+
+    wb.save(path)
+
+
+def write_export(path, fmt, sheets, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Écrit les tables dans le format demandé.
+
+    `sheets` associe un nom à un DataFrame ou à un tuple (DataFrame, masque
+    booléen[, colonnes]). CSV et Parquet n'acceptent qu'une seule table.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Format d'export inconnu: {fmt}")
+
+    if fmt == "Excel":
+        write_excel(path, sheets, chunk_rows)
+        return
+
+    normalized = _normalize_sheets(sheets)
+    if len(normalized) != 1:
+        raise ValueError(f"Le format {fmt} n'accepte qu'une seule table.")
+    _, frame, mask, columns = normalized[0]
+
+    if fmt == "CSV":
+        write_csv(path, frame, mask, columns, chunk_rows)
+    else:
+        write_parquet(path, frame, mask, columns, chunk_rows)
+
+
+def publish_export(path, export_root, file_name, retention_seconds=EXPORT_RETENTION_SECONDS):
+    """Déplace un export dans un sous-dossier au nom aléatoire de `export_root` et retourne son chemin relatif.
+
+    Les exports publiés depuis plus de `retention_seconds` sont supprimés au passage.
+    """
+    os.makedirs(export_root, exist_ok=True)
+    now = time.time()
+    for entry in os.scandir(export_root):
+        if entry.is_dir() and now - entry.stat().st_mtime > retention_seconds:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+    token = secrets.token_urlsafe(16)
+    os.makedirs(os.path.join(export_root, token))
+    shutil.move(path, os.path.join(export_root, token, file_name))
+    return f"{token}/{file_name}"
+
+
+def export_to_tempfile(sheets, fmt, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Écrit l'export dans un fichier temporaire et retourne son chemin."""
+    suffix = EXPORT_FORMATS[fmt][0]
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        write_export(path, fmt, sheets, chunk_rows)
+    except Exception:
+        os.unlink(path)
+        raise
+    return path
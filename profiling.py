@@ -0,0 +1,141 @@
+"""Profil des colonnes d'un modèle de blocs, calculé une seule fois au chargement."""
+import numpy as np
+import pandas as pd
+
+CATEGORICAL_THRESHOLD = 20
+OBJECT_CATEGORY_LIMIT = 1000
+FIRST_CHUNK_ROWS = 65_536
+CHUNK_ROWS = 1_000_000
+HLL_PRECISION = 12
+
+ROLE_KEYWORDS = {
+    "x": ['x', 'east', 'easting', 'x_centre'],
+    "y": ['y', 'north', 'northing', 'y_centre'],
+    "z": ['z', 'elev', 'elevation', 'z_centre'],
+    "grade": ['grade', 'teneur', 'au', 'cu', 'ag', 'zn', 'pb'],
+    "tonnage": ['ton', 'mass', 'weight'],
+    "density": ['dens', 'sg', 'specific'],
+    "dx": ['xinc', 'dx', 'xsize', 'size_x', 'x_size', 'xdim', 'dim_x'],
+    "dy": ['yinc', 'dy', 'ysize', 'size_y', 'y_size', 'ydim', 'dim_y'],
+    "dz": ['zinc', 'dz', 'zsize', 'size_z', 'z_size', 'zdim', 'dim_z'],
+}
+
+
+def approximate_distinct(values, precision=HLL_PRECISION):
+    """Estime le nombre de valeurs distinctes par HyperLogLog (erreur relative ~1,6 %)."""
+    values = np.asarray(values)
+    if len(values) == 0:
+        return 0
+
+    n_registers = 1 << precision
+    hashes = pd.util.hash_array(values, categorize=False)
+    register_idx = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    # Bit de garde : le rang est borné même si les bits restants sont nuls
+    remaining = (hashes << np.uint64(precision)) | np.uint64(1 << (precision - 1))
+    rank = 64 - np.floor(np.log2(remaining.astype(float))).astype(np.int64)
+
+    # Rang maximal par registre sans boucle Python : table de présence (registre, rang)
+    max_rank = 66
+    present = np.zeros((n_registers, max_rank), dtype=bool)
+    present[register_idx, np.minimum(rank, max_rank - 1)] = True
+    registers = np.where(present.any(axis=1), max_rank - 1 - np.argmax(present[:, ::-1], axis=1), 0)
+
+    alpha = 0.7213 / (1 + 1.079 / n_registers)
+    estimate = alpha * n_registers ** 2 / np.sum(np.exp2(-registers.astype(float)))
+    empty_registers = np.count_nonzero(registers == 0)
+    if estimate <= 2.5 * n_registers and empty_registers > 0:
+        estimate = n_registers * np.log(n_registers / empty_registers)
+    return int(round(estimate))
+
+
+def distinct_values(values, limit):
+    """Valeurs distinctes exactes tant qu'elles restent au plus `limit`, sinon None (sortie anticipée)."""
+    seen = set()
+    start, chunk_rows = 0, FIRST_CHUNK_ROWS
+    while start < len(values):
+        seen.update(pd.unique(values[start:start + chunk_rows]))
+        if len(seen) > limit:
+            return None
+        start += chunk_rows
+        chunk_rows = CHUNK_ROWS
+    return seen
+
+
+def profile_column(series):
+    """Profil d'une colonne : type, bornes, valeurs manquantes, cardinalité et catégories éventuelles."""
+    non_null = series.dropna().to_numpy()
+    numeric = pd.api.types.is_numeric_dtype(series)
+    is_object = series.dtype == 'object'
+
+    limit = OBJECT_CATEGORY_LIMIT if is_object else CATEGORICAL_THRESHOLD - 1
+    exact = distinct_values(non_null, limit)
+
+    column_profile = {
+        "dtype": str(series.dtype),
+        "numeric": numeric,
+        "min": float(np.min(non_null)) if numeric and len(non_null) else None,
+        "max": float(np.max(non_null)) if numeric and len(non_null) else None,
+        "nulls": int(len(series) - len(non_null)),
+        "distinct": len(exact) if exact is not None else approximate_distinct(non_null),
+        "distinct_exact": exact is not None,
+        "categories": sorted(exact, key=lambda v: (str(type(v)), v)) if exact is not None else None,
+    }
+    return column_profile
+
+
+def guess_column_roles(columns):
+    """Devine les colonnes de coordonnées, teneur, tonnage, densité et dimensions de blocs à partir de leurs noms."""
+    columns = list(columns)
+
+    def exact_match(role, default):
+        return next((col for col in columns if str(col).lower() in ROLE_KEYWORDS[role]), default)
+
+    def partial_match(role, default):
+        return next((col for col in columns if any(k in str(col).lower() for k in ROLE_KEYWORDS[role])), default)
+
+    return {
+        "x": exact_match("x", columns[0]),
+        "y": exact_match("y", columns[1] if len(columns) > 1 else columns[0]),
+        "z": exact_match("z", columns[2] if len(columns) > 2 else columns[0]),
+        "grade": partial_match("grade", columns[3] if len(columns) > 3 else columns[0]),
+        "tonnage": partial_match("tonnage", None),
+        "density": partial_match("density", None),
+        "dx": exact_match("dx", None),
+        "dy": exact_match("dy", None),
+        "dz": exact_match("dz", None),
+    }
+
+
+def profile_model(df):
+    """Profil complet du modèle : une passe par colonne et rôles devinés."""
+    return {
+        "n_rows": len(df),
+        "columns": {col: profile_column(df[col]) for col in df.columns},
+        "roles": guess_column_roles(df.columns),
+    }
+
+
+def extend_profile(profile, column_profiles):
+    """Retourne un profil complété par les profils des colonnes ajoutées au modèle (colonne estimée...)."""
+    return {**profile, "columns": {**profile["columns"], **column_profiles}}
+
+
+def categorical_filter_columns(profile):
+    """Colonnes utilisables comme filtre catégoriel (catégories exactes connues)."""
+    return [col for col, column_profile in profile["columns"].items() if column_profile["categories"] is not None]
+
+
+def profile_table(profile):
+    """Tableau récapitulatif du profil pour l'affichage."""
+    return pd.DataFrame([
+        {
+            "Colonne": col,
+            "Type": column_profile["dtype"],
+            "Minimum": column_profile["min"],
+            "Maximum": column_profile["max"],
+            "Valeurs manquantes": column_profile["nulls"],
+            "Valeurs distinctes": (f"{column_profile['distinct']:,}" if column_profile["distinct_exact"]
+                                   else f"≈ {column_profile['distinct']:,}"),
+        }
+        for col, column_profile in profile["columns"].items()
+    ])
@@ -0,0 +1,164 @@
+"""Stockage local partagé des résultats d'analyse (masques de filtres, fractions de volume, statistiques, courbes)."""
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import struct
+import time
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_STORE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "block_model_analyzer", "results.sqlite")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+HASH_CHUNK_BYTES = 8 * 1024 * 1024
+PARQUET_MAGIC = b"PAR1"
+
+
+def hash_bytes(data):
+    """Empreinte SHA-256 d'un contenu binaire (fichier importé, DXF...)."""
+    digest = hashlib.sha256()
+    view = memoryview(data)
+    for start in range(0, len(view), HASH_CHUNK_BYTES):
+        digest.update(view[start:start + HASH_CHUNK_BYTES])
+    return digest.hexdigest()
+
+
+def make_key(kind, **parts):
+    """Construit une clé stable à partir du type de résultat et de ses paramètres."""
+    payload = json.dumps({"kind": kind, **parts}, sort_keys=True, default=str)
+    return f"{kind}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+def pack_mask(mask):
+    """Compacte un masque booléen sur un bit par bloc."""
+    mask = np.asarray(mask, dtype=bool)
+    return struct.pack("<Q", len(mask)) + np.packbits(mask).tobytes()
+
+
+def unpack_mask(payload):
+    """Reconstruit un masque booléen compacté par `pack_mask`."""
+    (n_items,) = struct.unpack_from("<Q", payload)
+    bits = np.frombuffer(payload, dtype=np.uint8, offset=8)
+    return np.unpackbits(bits, count=n_items).astype(bool)
+
+
+class ResultStore:
+    """Cache clé-valeur SQLite, borné en taille et partagé entre sessions.
+
+    Chaque opération ouvre sa propre connexion : l'accès concurrent entre
+    sessions Streamlit (threads) ou processus est arbitré par SQLite en mode WAL.
+    Les entrées les moins récemment lues sont évincées au-delà de `max_bytes`.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_results_access ON results(last_access)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return contextlib.closing(conn)
+
+    def _get(self, key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+            return bytes(row[0])
+
+    def _put(self, key, kind, payload):
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO results (key, kind, payload, size, created, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, kind, payload, size, now, now),
+                )
+                self._evict(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self, conn):
+        """Supprime les entrées les moins récemment lues jusqu'à respecter la taille maximale."""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        stale_keys = []
+        for key, size in conn.execute("SELECT key, size FROM results ORDER BY last_access ASC"):
+            stale_keys.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM results WHERE key = ?", stale_keys)
+
+    def get_mask(self, key):
+        """Retourne le masque booléen stocké sous `key`, ou None."""
+        payload = self._get(key)
+        return None if payload is None else unpack_mask(payload)
+
+    def put_mask(self, key, mask):
+        """Stocke un masque booléen compacté."""
+        self._put(key, "mask", pack_mask(mask))
+
+    def get_array(self, key):
+        """Retourne le tableau numérique stocké sous `key`, ou None."""
+        payload = self._get(key)
+        return None if payload is None else np.load(io.BytesIO(payload), allow_pickle=False)
+
+    def put_array(self, key, values):
+        """Stocke un tableau numérique (fractions de volume...)."""
+        buffer = io.BytesIO()
+        np.save(buffer, np.asarray(values), allow_pickle=False)
+        self._put(key, "array", buffer.getvalue())
+
+    def get_frame(self, key):
+        """Retourne le DataFrame stocké sous `key`, ou None."""
+        payload = self._get(key)
+        # Les entrées JSON d'anciennes versions ne sont pas relues : elles seront recalculées
+        if payload is None or not payload.startswith(PARQUET_MAGIC):
+            return None
+        return pd.read_parquet(io.BytesIO(payload))
+
+    def put_frame(self, key, df):
+        """Stocke un tableau de résultats (statistiques, courbe tonnage-teneur...) en Parquet, sans perte de précision ni de types."""
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+        self._put(key, "frame", buffer.getvalue())
+
+    def usage(self):
+        """Retourne le nombre d'entrées et la taille totale stockée (octets)."""
+        with self._connect() as conn:
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return count, total
+
+    def clear(self):
+        """Vide le stockage."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM results")
+
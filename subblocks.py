@@ -0,0 +1,129 @@
+"""Modèles sous-blocs : dimensions par bloc, tonnage vectorisé et tests spatiaux en volume partiel."""
+import numpy as np
+import pyvista as pv
+from scipy.spatial import ConvexHull
+
+from analysis import compute_spatial_mask
+
+DEFAULT_SUBDIVISIONS = 3
+SUBSAMPLE_CHUNK_BLOCKS = 50_000
+
+
+def block_dimensions(df, size_columns=None, block_size=None):
+    """Dimensions (n, 3) de chaque bloc : colonnes XINC/YINC/ZINC ou taille fixe."""
+    if size_columns is not None:
+        return df[list(size_columns)].to_numpy(dtype=float)
+    return np.broadcast_to(np.asarray(block_size, dtype=float), (len(df), 3))
+
+
+def block_tonnage(df, density_column=None, default_density=2.7, size_columns=None, block_size=None):
+    """Tonnage par bloc (volume propre x densité), sans modifier le DataFrame."""
+    volume = np.prod(block_dimensions(df, size_columns, block_size), axis=1)
+    if density_column is not None and density_column in df.columns:
+        density = df[density_column].to_numpy(dtype=float)
+        density = np.where(np.isnan(density), default_density, density)
+    else:
+        density = default_density
+    return volume * density
+
+
+def _distance_to_mesh(points, mesh):
+    """Distance de chaque point à la surface du maillage."""
+    distances = pv.PolyData(np.asarray(points, dtype=float)).compute_implicit_distance(mesh)
+    return np.abs(np.asarray(distances["implicit_distance"]))
+
+
+def _surface_crossed(centres, radius, surface):
+    """Cellules dont les blocs peuvent se trouver de part et d'autre de la surface de référence.
+
+    Dans l'emprise (enveloppe convexe des sommets), la référence est la surface
+    interpolée : une cellule plus loin de celle-ci que son rayon n'est pas traversée.
+    Hors emprise, la référence est l'altitude d'un sommet : une cellule proche du bord
+    de l'emprise, ou hors emprise, est traversée si elle recoupe l'intervalle
+    d'altitudes des sommets.
+    """
+    vertices = np.asarray(surface.points, dtype=float)
+    interpolated = pv.PolyData(vertices).delaunay_2d()
+    crossed = _distance_to_mesh(centres, interpolated) <= radius
+
+    # Distance horizontale au bord de l'emprise (négative hors emprise)
+    hull = ConvexHull(vertices[:, :2])
+    footprint_margin = np.full(len(centres), np.inf)
+    for normal_x, normal_y, offset in hull.equations:
+        footprint_margin = np.minimum(footprint_margin, -(centres[:, 0] * normal_x + centres[:, 1] * normal_y + offset))
+
+    in_elevation_range = ((centres[:, 2] - radius <= vertices[:, 2].max())
+                          & (centres[:, 2] + radius >= vertices[:, 2].min()))
+    return crossed | ((footprint_margin <= radius) & in_elevation_range)
+
+
+def _classify_parent_cells(centres, radius, spatial_filters, envelope_mesh, surface_mesh):
+    """Classe les cellules parentes : 1 entièrement retenue, 0 entièrement exclue, -1 en bordure.
+
+    `radius` borne, pour chaque cellule, la distance entre son centre et tout point
+    de ses blocs. Une cellule dont le centre est plus loin de chaque maillage que
+    ce rayon n'est traversée par aucun d'eux : le test de son centre vaut pour tous ses blocs.
+    """
+    inside = compute_spatial_mask(centres, spatial_filters, envelope_mesh, surface_mesh)
+
+    crossed = np.zeros(len(centres), dtype=bool)
+    if "envelope" in spatial_filters and envelope_mesh is not None:
+        crossed |= _distance_to_mesh(centres, envelope_mesh) <= radius
+    if any(f.startswith("surface_") for f in spatial_filters) and surface_mesh is not None:
+        crossed |= _surface_crossed(centres, radius, surface_mesh)
+
+    return np.where(crossed, -1, inside.astype(np.int8))
+
+
+def _subsample_offsets(subdivisions):
+    """Positions relatives (s^3, 3) des sous-points dans un bloc unitaire centré."""
+    steps = (np.arange(subdivisions) + 0.5) / subdivisions - 0.5
+    return np.stack(np.meshgrid(steps, steps, steps, indexing='ij'), axis=-1).reshape(-1, 3)
+
+
+def spatial_volume_fraction(centres, dimensions, parent_size, spatial_filters,
+                            envelope_mesh=None, surface_mesh=None, subdivisions=DEFAULT_SUBDIVISIONS):
+    """Fraction du volume de chaque bloc respectant les contraintes spatiales DXF.
+
+    Les blocs sont regroupés par cellule parente. Les cellules entièrement à
+    l'intérieur ou à l'extérieur donnent une fraction de 1 ou 0 à tous leurs
+    sous-blocs ; seuls les blocs des cellules en bordure sont sous-échantillonnés
+    en `subdivisions`^3 points.
+    """
+    centres = np.asarray(centres, dtype=float)
+    dimensions = np.asarray(dimensions, dtype=float)
+    parent_size = np.asarray(parent_size, dtype=float)
+    fraction = np.zeros(len(centres), dtype=np.float32)
+
+    valid = np.flatnonzero(np.isfinite(centres).all(axis=1) & np.isfinite(dimensions).all(axis=1))
+    if len(valid) == 0:
+        return fraction
+
+    # Cellules parentes occupées par au moins un bloc
+    origin = (centres[valid] - dimensions[valid] / 2).min(axis=0)
+    parent_ijk = np.floor((centres[valid] - origin) / parent_size).astype(np.int64)
+    unique_parents, parent_of_block = np.unique(parent_ijk, axis=0, return_inverse=True)
+    parent_of_block = parent_of_block.reshape(-1)
+    parent_centres = origin + (unique_parents + 0.5) * parent_size
+
+    # Rayon englobant les blocs de chaque cellule : un bloc plus grand que sa cellule
+    # parente déborde de la demi-diagonale de celle-ci
+    block_radius = (np.linalg.norm(centres[valid] - parent_centres[parent_of_block], axis=1)
+                    + 0.5 * np.linalg.norm(dimensions[valid], axis=1))
+    cell_radius = np.zeros(len(unique_parents))
+    np.maximum.at(cell_radius, parent_of_block, block_radius)
+
+    parent_state = _classify_parent_cells(parent_centres, cell_radius, spatial_filters, envelope_mesh, surface_mesh)
+    block_state = parent_state[parent_of_block]
+    fraction[valid] = block_state == 1
+
+    # Sous-échantillonnage des seuls blocs en bordure
+    boundary = valid[block_state == -1]
+    offsets = _subsample_offsets(subdivisions)
+    for start in range(0, len(boundary), SUBSAMPLE_CHUNK_BLOCKS):
+        rows = boundary[start:start + SUBSAMPLE_CHUNK_BLOCKS]
+        points = (centres[rows, None, :] + offsets[None, :, :] * dimensions[rows, None, :]).reshape(-1, 3)
+        inside = compute_spatial_mask(points, spatial_filters, envelope_mesh, surface_mesh)
+        fraction[rows] = inside.reshape(len(rows), -1).mean(axis=1)
+
+    return fraction
@@ -0,0 +1,76 @@
+"""Analyse en swaths : teneurs moyennes et tonnages par tranches X, Y et Z."""
+import numpy as np
+import pandas as pd
+
+AXES = ("X", "Y", "Z")
+DEFAULT_SWATH_COUNT = 20
+
+
+def default_bin_sizes(coords, n_bins=DEFAULT_SWATH_COUNT):
+    """Largeurs de tranche par défaut : l'étendue de chaque direction divisée en `n_bins`."""
+    sizes = []
+    for axis_values in coords:
+        extent = float(np.nanmax(axis_values) - np.nanmin(axis_values)) if len(axis_values) else 0.0
+        sizes.append(extent / n_bins if extent > 0 else 1.0)
+    return sizes
+
+
+def calculate_swaths(coords, value_columns, weights=None, bin_sizes=None, origins=None):
+    """Calcule les swaths des trois directions en une seule agrégation par variable.
+
+    `coords` est un triplet de tableaux (x, y, z), `value_columns` associe un nom
+    de variable à son tableau de valeurs. Les indices de tranche des trois
+    directions sont concaténés avec un décalage, si bien qu'un seul appel à
+    `np.bincount` par quantité couvre X, Y et Z. Les moyennes sont pondérées
+    par `weights` (tonnage) en ignorant les valeurs manquantes de chaque variable.
+
+    `origins` fixe le début de la première tranche de chaque direction (par défaut
+    la coordonnée minimale) : des composites peuvent ainsi être découpés selon les
+    tranches d'un modèle. Les points situés avant l'origine sont ignorés.
+    """
+    coords = [np.asarray(axis_values, dtype=float) for axis_values in coords]
+    n_rows = len(coords[0])
+    if n_rows == 0:
+        return pd.DataFrame()
+
+    weights = np.ones(n_rows) if weights is None else np.nan_to_num(np.asarray(weights, dtype=float))
+    bin_sizes = default_bin_sizes(coords) if bin_sizes is None else bin_sizes
+    if origins is None:
+        origins = [float(np.nanmin(axis_values)) for axis_values in coords]
+
+    # Indices de tranche par direction, décalés pour partager un seul vecteur
+    counts, slice_idx, slice_rows = [], [], []
+    offset = 0
+    for axis_values, size, origin in zip(coords, bin_sizes, origins):
+        idx = np.floor((np.nan_to_num(axis_values, nan=origin) - origin) / size).astype(np.int32)
+        rows = np.flatnonzero(idx >= 0)
+        n_bins = int(idx[rows].max()) + 1 if len(rows) else 0
+        counts.append(n_bins)
+        slice_idx.append(idx[rows] + offset)
+        slice_rows.append(rows)
+        offset += n_bins
+
+    all_idx = np.concatenate(slice_idx)
+    all_rows = np.concatenate(slice_rows)
+    all_weights = weights[all_rows]
+    n_total = offset
+
+    result = pd.DataFrame({
+        "Direction": np.repeat(AXES, counts),
+        "Centre": np.concatenate([origin + (np.arange(n) + 0.5) * size
+                                  for origin, n, size in zip(origins, counts, bin_sizes)]),
+        "Nombre de blocs": np.bincount(all_idx, minlength=n_total),
+        "Tonnage": np.bincount(all_idx, weights=all_weights, minlength=n_total),
+    })
+
+    for name, values in value_columns.items():
+        values = np.asarray(values, dtype=float)[all_rows]
+        finite = np.isfinite(values)
+        valid_weights = np.where(finite, all_weights, 0.0)
+        weight_sum = np.bincount(all_idx, weights=valid_weights, minlength=n_total)
+        weighted_sum = np.bincount(all_idx, weights=np.where(finite, values, 0.0) * valid_weights, minlength=n_total)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result[f"Moyenne {name}"] = np.where(weight_sum > 0, weighted_sum / weight_sum, np.nan)
+
+    # Les tranches vides sont retirées pour ne pas interrompre les courbes
+    return result[result["Nombre de blocs"] > 0].reset_index(drop=True)
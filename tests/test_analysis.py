@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+import pyvista as pv
+
+from analysis import (calculate_grade_tonnage_curve, calculate_statistics, points_relative_to_surface,
+                      surface_elevation)
+
+
+@pytest.fixture
+def inclined_surface():
+    # Plan z = 0,1 x sur [0, 10] x [0, 10]
+    grid = np.linspace(0.0, 10.0, 3)
+    x, y = np.meshgrid(grid, grid)
+    return pv.PolyData(np.c_[x.ravel(), y.ravel(), 0.1 * x.ravel()]).delaunay_2d()
+
+
+def test_surface_elevation_interpolates_inside_footprint(inclined_surface):
+    points = np.array([[2.5, 3.0, 0.0], [7.5, 9.0, 0.0]])
+    np.testing.assert_allclose(surface_elevation(points, inclined_surface), [0.25, 0.75])
+
+
+def test_surface_elevation_uses_nearest_vertex_outside_footprint(inclined_surface):
+    points = np.array([[20.0, 5.0, 0.0], [-3.0, -3.0, 50.0], [np.nan, 1.0, 1.0]])
+    elevation = surface_elevation(points, inclined_surface)
+    assert elevation[:2].tolist() == [1.0, 0.0]
+    assert np.isnan(elevation[2])
+
+
+def test_points_relative_to_surface_outside_footprint(inclined_surface):
+    points = np.array([[5.0, 5.0, 1.0], [20.0, 5.0, 1.5], [20.0, 5.0, 0.5]])
+    assert points_relative_to_surface(points, inclined_surface, "above").tolist() == [True, True, False]
+    assert points_relative_to_surface(points, inclined_surface, "below").tolist() == [False, False, True]
+
+
+def reference_grade_tonnage_curve(df, grade_column, tonnage_column, cutoffs):
+    """Boucle d'origine, une sélection par teneur de coupure."""
+    results = []
+    total_tonnage = df[tonnage_column].sum()
+    for cutoff in cutoffs:
+        above_cutoff = df[df[grade_column] >= cutoff]
+        if above_cutoff.empty:
+            tonnage_above = avg_grade_above = metal_content = 0
+        else:
+            tonnage_above = above_cutoff[tonnage_column].sum()
+            avg_grade_above = ((above_cutoff[grade_column] * above_cutoff[tonnage_column]).sum() / tonnage_above
+                               if tonnage_above > 0 else 0)
+            metal_content = tonnage_above * avg_grade_above / 100
+        results.append({
+            "Teneur de coupure": cutoff,
+            "Tonnage > coupure": tonnage_above,
+            "% du tonnage total": 100 * tonnage_above / total_tonnage if total_tonnage > 0 else 0,
+            "Teneur moyenne > coupure": avg_grade_above,
+            "Contenu métallique": metal_content,
+        })
+    return pd.DataFrame(results)
+
+
+@pytest.fixture
+def block_model():
+    rng = np.random.default_rng(0)
+    n_blocks = 5_000
+    # Teneurs arrondies pour créer des égalités exactes avec les teneurs de coupure
+    grade = np.round(rng.lognormal(0.0, 0.8, n_blocks), 1)
+    tonnage = rng.uniform(100.0, 500.0, n_blocks)
+    grade[rng.choice(n_blocks, 200, replace=False)] = np.nan
+    tonnage[rng.choice(n_blocks, 200, replace=False)] = np.nan
+    return pd.DataFrame({"AU": grade, "TONNAGE": tonnage})
+
+
+def test_matches_reference_loop(block_model):
+    cutoffs = np.concatenate([np.arange(0.0, 3.0, 0.1), [np.nanmax(block_model["AU"]), 1_000.0]])
+    result = calculate_grade_tonnage_curve(block_model, "AU", "TONNAGE", cutoffs)
+    expected = reference_grade_tonnage_curve(block_model, "AU", "TONNAGE", cutoffs)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, rtol=1e-9)
+
+
+def test_cutoff_above_maximum_grade_is_empty(block_model):
+    result = calculate_grade_tonnage_curve(block_model, "AU", "TONNAGE", np.array([1_000.0]))
+    assert result.loc[0, "Tonnage > coupure"] == 0
+    assert result.loc[0, "Teneur moyenne > coupure"] == 0
+
+
+def test_cutoff_equal_to_grade_is_included():
+    df = pd.DataFrame({"AU": [0.5, 1.0, 1.0, 2.0], "TONNAGE": [10.0, 20.0, 30.0, 40.0]})
+    result = calculate_grade_tonnage_curve(df, "AU", "TONNAGE", np.array([1.0]))
+    assert result.loc[0, "Tonnage > coupure"] == pytest.approx(90.0)
+    assert result.loc[0, "Teneur moyenne > coupure"] == pytest.approx((20 + 30 + 80) / 90)
+
+
+def test_empty_inputs_return_empty_frame(block_model):
+    assert calculate_grade_tonnage_curve(block_model.iloc[0:0], "AU", "TONNAGE", np.array([1.0])).empty
+    assert calculate_grade_tonnage_curve(block_model, "AU", "TONNAGE", np.array([])).empty
+
+
+def test_statistics_total_tonnage_uses_given_column():
+    df = pd.DataFrame({"AU": [1.0, 3.0], "TONNES": [10.0, 30.0], "tonnage": [1.0, 1.0]})
+    stats = calculate_statistics(df, "AU", "TONNES").set_index("Statistique")["Valeur"]
+    assert stats["Tonnage total"] == 40.0
+    assert "Tonnage total" not in calculate_statistics(df, "AU", None)["Statistique"].tolist()
@@ -0,0 +1,95 @@
+import json
+
+import ezdxf
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_runner import main, resolve_cutoffs, run_scenarios, spatial_spec
+
+BOX_CORNERS = np.array([[x, y, z] for z in (0.0, 40.0) for y in (0.0, 100.0) for x in (0.0, 100.0)])
+BOX_FACES = [(0, 1, 3, 2), (4, 5, 7, 6), (0, 1, 5, 4), (2, 3, 7, 6), (0, 2, 6, 4), (1, 3, 7, 5)]
+
+
+def write_dxf(path, quads):
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    for quad in quads:
+        msp.add_3dface([tuple(vertex) for vertex in quad])
+    doc.saveas(path)
+
+
+@pytest.fixture
+def scenario_dir(tmp_path):
+    rng = np.random.default_rng(0)
+    axis = np.arange(5.0, 100.0, 10.0)
+    x, y, z = (values.ravel() for values in np.meshgrid(axis, axis, axis, indexing='ij'))
+    model = pd.DataFrame({"XC": x, "YC": y, "ZC": z, "AU": rng.lognormal(0.0, 0.5, len(x)),
+                          "TONNES": rng.uniform(100.0, 200.0, len(x)), "DOMAINE": rng.integers(1, 3, len(x))})
+    model.to_csv(tmp_path / "modele.csv", sep=";", index=False)
+
+    write_dxf(tmp_path / "fosse.dxf", [BOX_CORNERS[list(face)] for face in BOX_FACES])
+    write_dxf(tmp_path / "topo.dxf", [[(0, 0, 70), (100, 0, 70), (100, 100, 70), (0, 100, 70)]])
+
+    config = {
+        "model": {"path": "modele.csv", "delimiter": ";",
+                  "columns": {"x": "XC", "y": "YC", "z": "ZC", "grade": "AU", "tonnage": "TONNES"}},
+        "meshes": {"fosse": "fosse.dxf", "topo": "topo.dxf"},
+        "cutoffs": [0.5, 1.0, 1.5],
+        "scenarios": [
+            {"name": "Domaine 1 en profondeur", "filters": {"z": [0, 50], "categorical": {"column": "DOMAINE", "values": [1]}}},
+            {"name": "Fosse", "envelope": "fosse"},
+            {"name": "Sous la topographie", "surface": {"mesh": "topo", "relation": "below"}, "cutoffs": {"min": 1, "max": 2, "steps": 3}},
+        ],
+    }
+    (tmp_path / "scenarios.json").write_text(json.dumps(config), encoding="utf-8")
+    return tmp_path, model, config
+
+
+def test_scenarios_match_direct_selection(scenario_dir):
+    base_dir, model, config = scenario_dir
+
+    report_df, stats_df, gtc_df = run_scenarios(config, str(base_dir), workers=2)
+
+    expected_masks = {
+        "Domaine 1 en profondeur": (model["ZC"] <= 50) & (model["DOMAINE"] == 1),
+        "Fosse": model["ZC"] < 40,
+        "Sous la topographie": model["ZC"] <= 70,
+    }
+    stats = stats_df.pivot(index="Scénario", columns="Statistique", values="Valeur")
+    for name, mask in expected_masks.items():
+        assert stats.loc[name, "Nombre de blocs"] == mask.sum()
+        assert stats.loc[name, "Tonnage total"] == pytest.approx(model.loc[mask, "TONNES"].sum())
+        assert stats.loc[name, "Moyenne"] == pytest.approx(model.loc[mask, "AU"].mean())
+
+    assert gtc_df.groupby("Scénario", sort=False)["Teneur de coupure"].apply(list).to_dict() == {
+        "Domaine 1 en profondeur": [0.5, 1.0, 1.5], "Fosse": [0.5, 1.0, 1.5], "Sous la topographie": [1.0, 1.5, 2.0]}
+    # Une ligne par scénario et teneur de coupure dans le rapport consolidé
+    assert len(report_df) == len(gtc_df)
+
+
+def test_main_writes_report(scenario_dir, tmp_path):
+    base_dir, _, _ = scenario_dir
+    output = tmp_path / "rapport.csv"
+
+    assert main([str(base_dir / "scenarios.json"), "-o", str(output), "-w", "1"]) == 0
+
+    report = pd.read_csv(output)
+    assert report["Scénario"].nunique() == 3
+
+
+def test_undeclared_mesh_is_rejected(scenario_dir):
+    base_dir, _, config = scenario_dir
+    config["scenarios"] = [{"envelope": "inconnue"}]
+    with pytest.raises(ValueError, match="inconnue"):
+        run_scenarios(config, str(base_dir), workers=1)
+
+
+def test_spatial_spec_and_cutoffs():
+    assert spatial_spec({"envelope": "fosse", "surface": "topo"}) == ("fosse", "topo", "below")
+    assert spatial_spec({}) == (None, None, None)
+    with pytest.raises(ValueError):
+        spatial_spec({"surface": {"mesh": "topo", "relation": "dessus"}})
+
+    np.testing.assert_allclose(resolve_cutoffs({"min": 0, "max": 1, "steps": 3}, None), [0.0, 0.5, 1.0])
+    assert resolve_cutoffs(None, np.array([np.nan])).size == 0
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from comparison import align_blocks, block_deltas, detect_block_size, domain_reconciliation
+
+
+def brute_force_pairs(coords_a, coords_b):
+    """Paires (i, j) de blocs aux coordonnées identiques, portées par un seul bloc de chaque modèle."""
+    keys_a = [tuple(row) for row in coords_a]
+    keys_b = [tuple(row) for row in coords_b]
+    return {(i, j) for i, key_a in enumerate(keys_a) for j, key_b in enumerate(keys_b)
+            if key_a == key_b and keys_a.count(key_a) == 1 and keys_b.count(key_b) == 1}
+
+
+def test_detect_block_size():
+    assert detect_block_size(np.array([2.5, 7.5, 12.5, 7.5, np.nan])) == 5.0
+    assert detect_block_size(np.array([1.0])) == 1.0
+
+
+@pytest.mark.parametrize("extent", [4, 10_000])
+def test_align_blocks_matches_brute_force(extent):
+    # Grille compacte (table par cellule) et grille étendue (tri des clés)
+    rng = np.random.default_rng(extent)
+    coords_a = rng.integers(0, extent, (60, 3)) * 5.0
+    coords_b = rng.integers(0, extent, (50, 3)) * 5.0
+    coords_b[:20] = coords_a[rng.choice(60, 20, replace=False)]
+    # Écart de représentation sous la taille de bloc
+    coords_b += rng.uniform(-0.01, 0.01, coords_b.shape)
+
+    idx_a, idx_b, _ = align_blocks(coords_a, coords_b, [5.0, 5.0, 5.0])
+
+    assert set(zip(idx_a.tolist(), idx_b.tolist())) == brute_force_pairs(coords_a, np.round(coords_b / 5) * 5)
+
+
+def test_align_blocks_leaves_shared_keys_unmatched():
+    coords_a = np.array([[0.0, 0.0, 0.0], [0.0, 0.0, 0.0], [5.0, 0.0, 0.0], [10.0, 0.0, 0.0], [np.nan, 0.0, 0.0]])
+    coords_b = np.array([[10.0, 0.0, 0.0], [0.0, 0.0, 0.0], [5.0, 0.0, 0.0], [5.0, 0.0, 0.0]])
+
+    idx_a, idx_b, (shared_a, shared_b) = align_blocks(coords_a, coords_b, [5.0, 5.0, 5.0])
+
+    assert list(zip(idx_a.tolist(), idx_b.tolist())) == [(3, 0)]
+    assert (shared_a, shared_b) == (2, 2)
+
+
+def test_align_blocks_without_valid_coordinates():
+    idx_a, idx_b, shared = align_blocks(np.full((2, 3), np.nan), np.zeros((2, 3)), [1.0, 1.0, 1.0])
+    assert len(idx_a) == len(idx_b) == 0 and shared == (0, 0)
+
+
+def test_block_deltas():
+    coords = np.array([[0.0, 0.0, 0.0], [5.0, 0.0, 0.0]])
+    deltas = block_deltas(coords, [1.0, 2.0], [3.0, 1.5, 4.0], [10.0, 20.0], [10.0, 30.0, 40.0],
+                          np.array([1]), np.array([2]))
+    row = deltas.iloc[0]
+    assert row["X"] == 5.0
+    assert row["Écart teneur"] == pytest.approx(2.0)
+    assert row["Écart tonnage"] == pytest.approx(20.0)
+    assert row["Écart métal"] == pytest.approx((40 * 4.0 - 20 * 2.0) / 100)
+
+
+def test_domain_reconciliation_matches_groupby():
+    rng = np.random.default_rng(0)
+    domains_a = rng.choice(["ox", "sulf", "trans"], 500)
+    domains_b = rng.choice(["ox", "sulf", "stérile"], 400)
+    grade_a, grade_b = rng.uniform(0, 3, 500), rng.uniform(0, 3, 400)
+    grade_a[::13] = np.nan
+    tonnage_a, tonnage_b = rng.uniform(100, 200, 500), rng.uniform(100, 200, 400)
+
+    result = domain_reconciliation(domains_a, grade_a, tonnage_a, domains_b, grade_b, tonnage_b).set_index("Domaine")
+
+    assert result.index.tolist() == ["ox", "stérile", "sulf", "trans", "Total"]
+    for domains, grade, tonnage, suffix in ((domains_a, grade_a, tonnage_a, "A"), (domains_b, grade_b, tonnage_b, "B")):
+        frame = pd.DataFrame({"Domaine": domains, "grade": grade, "tonnage": tonnage})
+        graded = frame.dropna()
+        metal = (graded["grade"] * graded["tonnage"]).groupby(graded["Domaine"]).sum() / 100
+        tonnage_sum = frame.groupby("Domaine")["tonnage"].sum()
+        np.testing.assert_allclose(result.loc[tonnage_sum.index, f"Tonnage {suffix}"], tonnage_sum)
+        np.testing.assert_allclose(result.loc[metal.index, f"Métal {suffix}"], metal)
+        np.testing.assert_allclose(result.loc["Total", f"Métal {suffix}"], metal.sum())
+        np.testing.assert_allclose(result.loc["Total", f"Teneur {suffix}"], metal.sum() * 100 / graded["tonnage"].sum())
+    assert result.loc["trans", "Tonnage B"] == 0.0
+    assert np.isnan(result.loc["stérile", "Écart métal (%)"])
+
+
+def test_domain_reconciliation_compares_codes_of_different_types():
+    grade, tonnage = np.ones(3), np.full(3, 10.0)
+    result = domain_reconciliation(np.array([1, 2, 2]), grade, tonnage, np.array(["1", "1", "2"]), grade, tonnage)
+    assert result["Domaine"].tolist() == ["1", "2", "Total"]
+    assert result["Écart tonnage"].tolist() == [10.0, -10.0, 0.0]
+
+
+def test_domain_reconciliation_without_domain_has_only_total():
+    result = domain_reconciliation(None, [1.0, 2.0], [10.0, 10.0], None, [1.0], [20.0])
+    assert result["Domaine"].tolist() == ["Total"]
+    assert result.loc[0, "Écart tonnage"] == 0.0
+    assert result.loc[0, "Teneur A"] == pytest.approx(1.5)
@@ -0,0 +1,28 @@
+import numpy as np
+
+from estimation import anisotropy_matrix, estimate_grades
+
+
+def test_isotropic_matrix_is_identity():
+    np.testing.assert_allclose(anisotropy_matrix(0, 0, 0, 50, 50, 50), np.eye(3), atol=1e-12)
+
+
+def test_semi_axis_maps_to_major_range():
+    # Azimut 90° : l'axe principal pointe vers l'est, les axes secondaires restent orthogonaux
+    transform = anisotropy_matrix(90, 0, 0, 100, 25, 10)
+    np.testing.assert_allclose(np.linalg.norm(transform @ np.array([100.0, 0.0, 0.0])), 100.0)
+    np.testing.assert_allclose(np.linalg.norm(transform @ np.array([0.0, 25.0, 0.0])), 100.0)
+    np.testing.assert_allclose(np.linalg.norm(transform @ np.array([0.0, 0.0, 10.0])), 100.0)
+
+
+def test_inverse_distance_matches_direct_computation():
+    samples = np.array([[0.0, 0.0, 0.0], [10.0, 0.0, 0.0], [0.0, 20.0, 0.0]])
+    values = np.array([1.0, 2.0, 4.0])
+    blocks = np.array([[5.0, 5.0, 0.0], [0.0, 0.0, 0.0], [500.0, 500.0, 500.0]])
+
+    estimate, n_used = estimate_grades(blocks, samples, values, power=2.0, ranges=(100.0, 100.0, 100.0))
+
+    weights = 1.0 / np.linalg.norm(samples - blocks[0], axis=1) ** 2
+    np.testing.assert_allclose(estimate[0], np.sum(weights * values) / weights.sum())
+    assert estimate[1] == 1.0
+    assert np.isnan(estimate[2]) and n_used[2] == 0
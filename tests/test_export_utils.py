@@ -0,0 +1,74 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import export_utils
+from export_utils import export_to_tempfile, publish_export, write_export
+
+
+@pytest.fixture
+def model():
+    return pd.DataFrame({
+        "X": np.arange(10, dtype=float),
+        "AU": np.linspace(0.0, 1.0, 10),
+        "ROCHE": [None, None, None, "ox", "ox", None, "sulf", None, None, None],
+    })
+
+
+def test_csv_writes_masked_rows_in_chunks(model, tmp_path):
+    mask = model["X"].to_numpy() % 2 == 0
+    path = tmp_path / "export.csv"
+
+    write_export(path, "CSV", {"Modele": (model, mask, ["X", "AU"])}, chunk_rows=2)
+
+    pd.testing.assert_frame_equal(pd.read_csv(path), model.loc[mask, ["X", "AU"]].reset_index(drop=True))
+
+
+def test_parquet_keeps_type_of_column_empty_in_first_chunk(model, tmp_path):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "export.parquet"
+
+    # Le premier paquet ne contient aucune valeur de ROCHE
+    write_export(path, "Parquet", {"Modele": model}, chunk_rows=3)
+
+    result = pd.read_parquet(path)
+    assert result["ROCHE"].tolist() == model["ROCHE"].tolist()
+    pd.testing.assert_series_equal(result["AU"], model["AU"])
+
+
+def test_excel_splits_sheets_beyond_row_limit(model, tmp_path, monkeypatch):
+    pytest.importorskip("openpyxl")
+    monkeypatch.setattr(export_utils, "EXCEL_MAX_ROWS", 5)
+    path = tmp_path / "export.xlsx"
+
+    write_export(path, "Excel", {"Modele": model}, chunk_rows=3)
+
+    sheets = pd.read_excel(path, sheet_name=None)
+    assert list(sheets) == ["Modele", "Modele_2", "Modele_3"]
+    pd.testing.assert_series_equal(pd.concat(sheets.values(), ignore_index=True)["X"], model["X"],
+                                   check_dtype=False)
+
+
+def test_single_table_formats_reject_several_tables(model):
+    with pytest.raises(ValueError):
+        export_to_tempfile({"A": model, "B": model}, "CSV")
+
+
+def test_publish_export_moves_file_and_purges_old_exports(model, tmp_path):
+    export_root = tmp_path / "exports"
+    stale = export_root / "ancien"
+    stale.mkdir(parents=True)
+    old = time.time() - 7200
+    os.utime(stale, (old, old))
+
+    path = export_to_tempfile({"Modele": model}, "CSV")
+    relative_path = publish_export(path, str(export_root), "modele.csv", retention_seconds=3600)
+
+    assert not os.path.exists(path)
+    assert not stale.exists()
+    token, file_name = relative_path.split("/")
+    assert file_name == "modele.csv"
+    assert len(pd.read_csv(export_root / token / file_name)) == len(model)
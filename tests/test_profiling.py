@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from profiling import (approximate_distinct, categorical_filter_columns, extend_profile, guess_column_roles,
+                       profile_column, profile_model)
+
+
+def test_approximate_distinct_small_cardinality_is_close():
+    assert abs(approximate_distinct(np.arange(1_000)) - 1_000) <= 20
+
+
+def test_approximate_distinct_large_cardinality_within_error():
+    values = np.tile(np.arange(200_000, dtype=float), 2)
+    estimate = approximate_distinct(values)
+    assert abs(estimate - 200_000) / 200_000 < 0.05
+
+
+def test_approximate_distinct_empty():
+    assert approximate_distinct(np.array([])) == 0
+
+
+def test_profile_column_categories_and_early_exit():
+    codes = profile_column(pd.Series([2, 1, None, 2], dtype="float64"))
+    assert codes["categories"] == [1.0, 2.0]
+    assert (codes["min"], codes["max"], codes["nulls"]) == (1.0, 2.0, 1)
+
+    continuous = profile_column(pd.Series(np.arange(100_000, dtype=float)))
+    assert continuous["categories"] is None and not continuous["distinct_exact"]
+    assert abs(continuous["distinct"] - 100_000) / 100_000 < 0.05
+
+
+def test_guess_column_roles():
+    roles = guess_column_roles(["XC", "YC", "ZC", "AU_PPM", "DENSITY", "XINC", "YINC", "ZINC", "TONNES"])
+    assert (roles["grade"], roles["density"], roles["tonnage"]) == ("AU_PPM", "DENSITY", "TONNES")
+    assert (roles["dx"], roles["dy"], roles["dz"]) == ("XINC", "YINC", "ZINC")
+    assert guess_column_roles(["X", "Y", "Z", "CU"])["dx"] is None
+
+
+def test_extend_profile_adds_precomputed_columns():
+    df = pd.DataFrame({"X": [0.0, 1.0], "DOMAINE": [1, 2]})
+    profile = profile_model(df)
+    extended = extend_profile(profile, {"AU_idw": profile_column(pd.Series([0.5, np.nan]))})
+
+    assert list(extended["columns"]) == ["X", "DOMAINE", "AU_idw"]
+    assert "AU_idw" not in profile["columns"]
+    assert "AU_idw" in categorical_filter_columns(extended)
@@ -0,0 +1,72 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from result_store import ResultStore, make_key, pack_mask, unpack_mask
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(str(tmp_path / "results.sqlite"))
+
+
+@pytest.mark.parametrize("n_items", [0, 1, 7, 8, 9, 1_001])
+def test_pack_mask_round_trip(n_items):
+    mask = np.random.default_rng(n_items).random(n_items) < 0.3
+    restored = unpack_mask(pack_mask(mask))
+    assert restored.dtype == bool
+    np.testing.assert_array_equal(restored, mask)
+
+
+def test_make_key_ignores_parameter_order():
+    assert make_key("stats", grade="AU", filters="abc") == make_key("stats", filters="abc", grade="AU")
+    assert make_key("stats", grade="AU") != make_key("stats", grade="CU")
+
+
+def test_mask_array_and_frame_round_trip(store):
+    mask = np.array([True, False, True])
+    fraction = np.array([0.0, 0.25, 1.0], dtype=np.float32)
+    frame = pd.DataFrame({"Domaine": ["ox", None], "Tonnage": [1.5, np.nan], "Blocs": [3, 4]})
+
+    store.put_mask("mask:a", mask)
+    store.put_array("array:a", fraction)
+    store.put_frame("frame:a", frame)
+
+    np.testing.assert_array_equal(store.get_mask("mask:a"), mask)
+    restored = store.get_array("array:a")
+    assert restored.dtype == np.float32
+    np.testing.assert_array_equal(restored, fraction)
+    pd.testing.assert_frame_equal(store.get_frame("frame:a"), frame)
+    assert store.get_mask("mask:absent") is None
+
+
+def test_frame_from_older_json_entry_is_recomputed(store):
+    store._put("frame:ancien", "frame", b'{"columns": []}')
+    assert store.get_frame("frame:ancien") is None
+
+
+def test_least_recently_read_entries_are_evicted(store):
+    payload = np.zeros(100, dtype=np.uint8)
+    store.put_array("array:1", payload)
+    entry_size = store.usage()[1]
+    store.max_bytes = 2 * entry_size
+    store.put_array("array:2", payload)
+
+    # La deuxième entrée n'a pas été lue depuis longtemps, la première vient d'être relue
+    with sqlite3.connect(store.path) as conn:
+        conn.execute("UPDATE results SET last_access = 0 WHERE key = 'array:2'")
+    assert store.get_array("array:1") is not None
+    store.put_array("array:3", payload)
+
+    assert store.get_array("array:2") is None
+    assert store.get_array("array:1") is not None
+    assert store.get_array("array:3") is not None
+    assert store.usage() == (2, 2 * entry_size)
+
+
+def test_entry_larger_than_store_is_not_kept(store):
+    store.max_bytes = 10
+    store.put_array("array:gros", np.zeros(100))
+    assert store.usage() == (0, 0)
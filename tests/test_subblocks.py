@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+import pyvista as pv
+
+from analysis import compute_spatial_mask
+from subblocks import _subsample_offsets, block_dimensions, block_tonnage, spatial_volume_fraction
+
+PARENT_SIZE = [16.0, 16.0, 16.0]
+SUBDIVISIONS = 4
+
+
+@pytest.fixture
+def subblocked_model():
+    """Grille 4 x 4 x 4 de cellules de 16 m : cellules centrales entières, cellules de bord en 8 sous-blocs de 8 m."""
+    centres, dimensions = [], []
+    for cell in np.ndindex(4, 4, 4):
+        origin = 16.0 * np.array(cell)
+        if all(index in (1, 2) for index in cell):
+            centres.append(origin + 8.0)
+            dimensions.append([16.0, 16.0, 16.0])
+        else:
+            for sub in np.ndindex(2, 2, 2):
+                centres.append(origin + 8.0 * np.array(sub) + 4.0)
+                dimensions.append([8.0, 8.0, 8.0])
+    return np.array(centres), np.array(dimensions)
+
+
+@pytest.fixture
+def box():
+    # Faces sur les limites des sous-échantillons (pas de 2 m pour les sous-blocs, 4 m pour les blocs entiers)
+    return pv.Box(bounds=(2.0, 58.0, 2.0, 58.0, 2.0, 58.0)).triangulate()
+
+
+@pytest.fixture
+def flat_surface():
+    grid = np.linspace(-10.0, 74.0, 3)
+    x, y = np.meshgrid(grid, grid)
+    return pv.PolyData(np.c_[x.ravel(), y.ravel(), np.full(x.size, 36.0)]).delaunay_2d()
+
+
+def filtered_volume(subblocked_model, spatial_filters, envelope_mesh=None, surface_mesh=None):
+    centres, dimensions = subblocked_model
+    fraction = spatial_volume_fraction(centres, dimensions, PARENT_SIZE, spatial_filters,
+                                       envelope_mesh, surface_mesh, SUBDIVISIONS)
+    return float(np.sum(fraction * np.prod(dimensions, axis=1)))
+
+
+def test_envelope_volume_matches_analytic_box(subblocked_model, box):
+    assert filtered_volume(subblocked_model, ["envelope"], envelope_mesh=box) == 56.0 ** 3
+
+
+def test_surface_volume_matches_analytic_slab(subblocked_model, box, flat_surface):
+    assert filtered_volume(subblocked_model, ["surface_below"], surface_mesh=flat_surface) == 64.0 * 64.0 * 36.0
+    assert filtered_volume(subblocked_model, ["envelope", "surface_below"], box, flat_surface) == 56.0 * 56.0 * 34.0
+
+
+def test_matches_subsampling_of_every_block(subblocked_model, box, flat_surface):
+    centres, dimensions = subblocked_model
+    spatial_filters = ["envelope", "surface_below"]
+    fraction = spatial_volume_fraction(centres, dimensions, PARENT_SIZE, spatial_filters, box, flat_surface, SUBDIVISIONS)
+
+    offsets = _subsample_offsets(SUBDIVISIONS)
+    points = (centres[:, None, :] + offsets[None, :, :] * dimensions[:, None, :]).reshape(-1, 3)
+    expected = compute_spatial_mask(points, spatial_filters, box, flat_surface).reshape(len(centres), -1).mean(axis=1)
+    np.testing.assert_array_equal(fraction, expected.astype(np.float32))
+
+
+def test_blocks_without_coordinates_have_zero_fraction(box):
+    centres = np.array([[30.0, 30.0, 30.0], [np.nan, 30.0, 30.0]])
+    fraction = spatial_volume_fraction(centres, np.full((2, 3), 8.0), PARENT_SIZE, ["envelope"], box)
+    assert fraction.tolist() == [1.0, 0.0]
+
+
+def test_block_tonnage_from_block_dimensions():
+    df = pd.DataFrame({"XINC": [2.0, 4.0], "YINC": [2.0, 4.0], "ZINC": [1.0, 2.0], "DENS": [3.0, np.nan]})
+    np.testing.assert_allclose(block_dimensions(df, ["XINC", "YINC", "ZINC"]), [[2, 2, 1], [4, 4, 2]])
+    np.testing.assert_allclose(block_tonnage(df, "DENS", 2.5, ["XINC", "YINC", "ZINC"]), [12.0, 80.0])
+    np.testing.assert_allclose(block_tonnage(df, None, 2.0, block_size=(5.0, 5.0, 5.0)), [250.0, 250.0])
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from swath import calculate_swaths
+
+
+def test_matches_groupby_per_direction():
+    rng = np.random.default_rng(1)
+    n_blocks = 2_000
+    coords = [rng.uniform(0.0, 100.0, n_blocks), rng.uniform(0.0, 50.0, n_blocks), rng.uniform(0.0, 20.0, n_blocks)]
+    grade = rng.uniform(0.0, 3.0, n_blocks)
+    grade[::17] = np.nan
+    tonnage = rng.uniform(100.0, 500.0, n_blocks)
+    bin_sizes = [10.0, 5.0, 2.5]
+
+    result = calculate_swaths(coords, {"AU": grade}, tonnage, bin_sizes)
+
+    for axis, values, size in zip("XYZ", coords, bin_sizes):
+        bins = np.floor((values - values.min()) / size).astype(int)
+        frame = pd.DataFrame({"bin": bins, "grade": grade, "tonnage": tonnage})
+        graded = frame.dropna(subset=["grade"])
+        expected_mean = (graded["grade"] * graded["tonnage"]).groupby(graded["bin"]).sum() / graded.groupby("bin")["tonnage"].sum()
+
+        swaths = result[result["Direction"] == axis].reset_index(drop=True)
+        assert swaths["Nombre de blocs"].tolist() == frame.groupby("bin").size().tolist()
+        np.testing.assert_allclose(swaths["Tonnage"], frame.groupby("bin")["tonnage"].sum())
+        np.testing.assert_allclose(swaths["Moyenne AU"], expected_mean.to_numpy())
+
+
+def test_unweighted_mean_without_tonnage():
+    coords = [np.array([0.0, 1.0, 10.0]), np.zeros(3), np.zeros(3)]
+    result = calculate_swaths(coords, {"AU": np.array([1.0, 3.0, 5.0])}, None, [5.0, 1.0, 1.0])
+    x_swaths = result[result["Direction"] == "X"]
+    assert x_swaths["Moyenne AU"].tolist() == pytest.approx([2.0, 5.0])
+
+
+def test_origins_align_samples_on_model_slices():
+    coords = [np.array([-3.0, 1.0, 4.0, 12.0]), np.zeros(4), np.zeros(4)]
+    result = calculate_swaths(coords, {"AU": np.array([9.0, 1.0, 3.0, 5.0])}, None, [5.0, 1.0, 1.0],
+                              origins=[0.0, 0.0, 0.0])
+    x_swaths = result[result["Direction"] == "X"]
+    # Le point situé avant l'origine est ignoré ; les centres sont ceux des tranches du modèle
+    assert x_swaths["Centre"].tolist() == [2.5, 12.5]
+    assert x_swaths["Nombre de blocs"].tolist() == [2, 1]
+    assert x_swaths["Moyenne AU"].tolist() == pytest.approx([2.0, 5.0])
@@ -0,0 +1,63 @@
+import numpy as np
+import pyvista as pv
+
+from viewer3d import decimate_mesh, mesh_to_arrays, voxel_aggregate
+
+
+def regular_model(n_per_axis=30, size=5.0):
+    axis = (np.arange(n_per_axis) + 0.5) * size
+    return np.stack(np.meshgrid(axis, axis, axis, indexing='ij'), axis=-1).reshape(-1, 3)
+
+
+def test_below_budget_blocks_are_kept_and_invalid_dropped():
+    points = np.array([[0.0, 0.0, 0.0], [1.0, 1.0, 1.0], [np.nan, 0.0, 0.0]])
+    voxels = voxel_aggregate(points, np.array([1.0, 2.0, 3.0]), point_budget=10)
+    np.testing.assert_array_equal(voxels["centers"], points[:2])
+    assert voxels["count"].tolist() == [1, 1]
+    assert voxels["cell_size"] == 0.0
+
+
+def test_voxels_respect_budget_and_conserve_totals():
+    rng = np.random.default_rng(0)
+    points = regular_model()
+    grade = rng.lognormal(0.0, 0.5, len(points))
+    tonnage = rng.uniform(100.0, 500.0, len(points))
+
+    voxels = voxel_aggregate(points, grade, tonnage, point_budget=1_000)
+
+    assert len(voxels["centers"]) <= 1_000
+    assert voxels["count"].sum() == len(points)
+    np.testing.assert_allclose(voxels["weight"].sum(), tonnage.sum())
+    # Métal conservé : la teneur de chaque voxel est la moyenne pondérée de ses blocs
+    np.testing.assert_allclose((voxels["value"] * voxels["weight"]).sum(), (grade * tonnage).sum())
+
+
+def test_voxel_value_is_tonnage_weighted_mean_of_its_blocks():
+    points = regular_model(n_per_axis=4, size=1.0)
+    grade = np.arange(len(points), dtype=float)
+    tonnage = np.where(grade % 2 == 0, 1.0, 3.0)
+
+    voxels = voxel_aggregate(points, grade, tonnage, point_budget=1)
+
+    assert voxels["count"].tolist() == [len(points)]
+    np.testing.assert_allclose(voxels["value"], [(grade * tonnage).sum() / tonnage.sum()])
+
+
+def test_flat_model_is_aggregated():
+    points = regular_model()[:900].copy()
+    points[:, 2] = 10.0
+    voxels = voxel_aggregate(points, np.ones(len(points)), point_budget=100)
+    assert 0 < len(voxels["centers"]) <= 100
+    assert voxels["count"].sum() == len(points)
+
+
+def test_decimation_respects_triangle_budget():
+    sphere = pv.Sphere(theta_resolution=60, phi_resolution=60)
+    assert sphere.n_cells > 2_000
+
+    decimated = decimate_mesh(sphere, triangle_budget=500)
+    vertices, faces = mesh_to_arrays(sphere, triangle_budget=500)
+
+    assert decimated.n_cells <= 500
+    assert faces.shape == (decimated.n_cells, 3)
+    assert faces.max() < len(vertices)
@@ -0,0 +1,145 @@
+"""Vue 3D à niveaux de détail : agrégation des blocs en voxels et décimation des maillages DXF."""
+import numpy as np
+import plotly.graph_objects as go
+
+DEFAULT_POINT_BUDGET = 50_000
+DEFAULT_TRIANGLE_BUDGET = 50_000
+MAX_COARSENING_STEPS = 12
+
+
+def _voxel_keys(points, origin, cell_size):
+    """Indice linéaire du voxel contenant chaque point, et dimensions de la grille."""
+    ijk = np.floor((points - origin) / cell_size).astype(np.int64)
+    dims = ijk.max(axis=0) + 1
+    keys = (ijk[:, 0] * dims[1] + ijk[:, 1]) * dims[2] + ijk[:, 2]
+    return keys, dims
+
+
+def voxel_aggregate(points, values, weights=None, point_budget=DEFAULT_POINT_BUDGET):
+    """Fusionne les blocs dans une grille de voxels respectant le budget de points.
+
+    La taille de voxel part d'une estimation volume / budget puis grossit jusqu'à
+    ce que le nombre de voxels occupés tienne dans le budget. Chaque voxel porte
+    la teneur moyenne pondérée (par le tonnage si fourni), la somme des poids
+    et le nombre de blocs fusionnés. Sous le budget, les blocs sont rendus tels quels.
+    """
+    points = np.asarray(points, dtype=float)
+    values = np.asarray(values, dtype=float)
+    weights = np.ones(len(points)) if weights is None else np.asarray(weights, dtype=float)
+
+    valid = np.isfinite(points).all(axis=1) & np.isfinite(values) & np.isfinite(weights)
+    points, values, weights = points[valid], values[valid], weights[valid]
+
+    if len(points) <= point_budget:
+        return {
+            "centers": points,
+            "value": values,
+            "weight": weights,
+            "count": np.ones(len(points), dtype=np.int64),
+            "cell_size": 0.0,
+        }
+
+    origin = points.min(axis=0)
+    extent = points.max(axis=0) - origin
+    # Un axe plat (modèle 2D, tranche) ne doit pas écraser l'estimation initiale
+    extent = np.maximum(extent, extent.max() * 1e-3)
+    cell_size = float((np.prod(extent) / point_budget) ** (1 / 3))
+
+    for _ in range(MAX_COARSENING_STEPS):
+        keys, dims = _voxel_keys(points, origin, cell_size)
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        if len(unique_keys) <= point_budget:
+            break
+        cell_size *= max(1.1, (len(unique_keys) / point_budget) ** (1 / 3))
+    else:
+        keys, dims = _voxel_keys(points, origin, cell_size)
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+
+    n_voxels = len(unique_keys)
+    count = np.bincount(inverse, minlength=n_voxels)
+    weight_sum = np.bincount(inverse, weights=weights, minlength=n_voxels)
+    weighted_value = np.bincount(inverse, weights=weights * values, minlength=n_voxels)
+    plain_value = np.bincount(inverse, weights=values, minlength=n_voxels) / count
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        value = np.where(weight_sum > 0, weighted_value / weight_sum, plain_value)
+
+    ijk = np.stack(np.unravel_index(unique_keys, dims), axis=1)
+    centers = origin + (ijk + 0.5) * cell_size
+
+    return {
+        "centers": centers,
+        "value": value,
+        "weight": weight_sum,
+        "count": count,
+        "cell_size": cell_size,
+    }
+
+
+def decimate_mesh(mesh, triangle_budget=DEFAULT_TRIANGLE_BUDGET):
+    """Triangule et décime un maillage pyvista pour respecter le budget de triangles."""
+    triangles = mesh.triangulate()
+    if triangles.n_cells > triangle_budget:
+        triangles = triangles.decimate(1.0 - triangle_budget / triangles.n_cells)
+    return triangles
+
+
+def mesh_to_arrays(mesh, triangle_budget=DEFAULT_TRIANGLE_BUDGET):
+    """Retourne (sommets, triangles) d'un maillage décimé, prêts pour un Mesh3d plotly."""
+    triangles = decimate_mesh(mesh, triangle_budget)
+    vertices = np.asarray(triangles.points, dtype=np.float32)
+    faces = np.asarray(triangles.faces).reshape(-1, 4)[:, 1:]
+    return vertices, faces
+
+
+def build_lod_figure(voxels, value_label, meshes=(), bounds=None, marker_size=4):
+    """Construit la figure plotly des voxels colorés par teneur et des maillages superposés.
+
+    `meshes` est une liste de (nom, (sommets, triangles), couleur).
+    """
+    centers = voxels["centers"]
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter3d(
+        x=centers[:, 0].astype(np.float32),
+        y=centers[:, 1].astype(np.float32),
+        z=centers[:, 2].astype(np.float32),
+        mode="markers",
+        name="Blocs",
+        customdata=voxels["count"],
+        hovertemplate=f"{value_label}: %{{marker.color:.3f}}<br>Blocs fusionnés: %{{customdata}}<extra></extra>",
+        marker=dict(
+            size=marker_size,
+            symbol="square",
+            color=voxels["value"].astype(np.float32),
+            colorscale="Viridis",
+            colorbar=dict(title=value_label),
+            opacity=0.9,
+        ),
+    ))
+
+    for name, (vertices, faces), color in meshes:
+        fig.add_trace(go.Mesh3d(
+            x=vertices[:, 0], y=vertices[:, 1], z=vertices[:, 2],
+            i=faces[:, 0], j=faces[:, 1], k=faces[:, 2],
+            name=name,
+            color=color,
+            opacity=0.3,
+            showlegend=True,
+        ))
+
+    scene = dict(xaxis=dict(title="X"), yaxis=dict(title="Y"), zaxis=dict(title="Z"), aspectmode="data")
+    if bounds is not None:
+        (x0, x1), (y0, y1), (z0, z1) = bounds
+        span = np.maximum([x1 - x0, y1 - y0, z1 - z0], 1e-9)
+        scene.update(
+            xaxis=dict(title="X", range=[x0, x1]),
+            yaxis=dict(title="Y", range=[y0, y1]),
+            zaxis=dict(title="Z", range=[z0, z1]),
+            aspectmode="manual",
+            aspectratio=dict(zip("xyz", (span / span.max()).tolist())),
+        )
+
+    fig.update_layout(scene=scene, height=700, margin=dict(l=0, r=0, t=30, b=0),
+                      legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5))
+    return fig